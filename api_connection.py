@@ -1,9 +1,24 @@
 from dotenv import load_dotenv
 import os
+import random
+import time
 import requests
-from requests.exceptions import RequestException
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException, ConnectionError, Timeout
+
+from models import instrumentation
+from models.omdb_cache import OmdbCache
 
 OMDB_BASE_URL = "https://www.omdbapi.com/"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_cache = None
+_mirror = None
+_client = None
+
+
+class OfflineError(RequestException):
+    """Raised when a lookup the local mirror can't answer needs the OMDb API but no API key is set."""
 
 
 def build_url(api_key, **params):
@@ -12,28 +27,154 @@ def build_url(api_key, **params):
     return f"{OMDB_BASE_URL}?{query_string}&apikey={api_key}"
 
 
-def search_movies_api():
-    """Searches for movies using the OMDb API."""
-    load_dotenv()  # Load API key from .env file
-    api_key = os.getenv("OMDB_API_KEY")
+def get_cache():
+    """Returns the shared OMDb response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = OmdbCache()
+    return _cache
+
+
+def get_mirror():
+    """Returns the local OMDb metadata mirror, or None if no dump has been loaded into it."""
+    global _mirror
+    if _mirror is None:
+        from models.mirror import OmdbMirror
+        _mirror = OmdbMirror()
+    return None if _mirror.is_empty() else _mirror
+
+
+class OmdbClient:
+    """Talks to the OMDb API over a pooled keep-alive session with timeouts and retries."""
+    def __init__(self, api_key=None, cache=None, mirror=None, connect_timeout=3.05, read_timeout=10,
+                 max_retries=3, backoff_factor=0.5, max_backoff=8, pool_size=10):
+        """Initializes the client, loading the API key from .env once if none is given.
+
+        With a local mirror the key is optional; lookups the mirror can't answer then raise OfflineError.
+        """
+        if api_key is None:
+            load_dotenv()  # Load API key from .env file
+            api_key = os.getenv("OMDB_API_KEY")
+        if not api_key and mirror is None:
+            raise ValueError("OMDB_API_KEY not found in .env file")
+
+        self.api_key = api_key
+        self.cache = cache
+        self.mirror = mirror
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, limiter=None, **params):
+        """Returns the OMDb response for the given query, serving it from the mirror or the cache when possible.
+
+        An optional limiter (see bulk_import.RateLimiter) is waited on before each HTTP request only.
+        """
+        if self.mirror is not None:
+            start = time.perf_counter()
+            data = self.mirror.get(**params)
+            if data is not None:
+                if instrumentation.is_enabled():
+                    instrumentation.record("omdb", "mirror hit", time.perf_counter() - start)
+                return data
+
+        if self.cache is not None:
+            start = time.perf_counter()
+            data = self.cache.get(params)
+            if data is not None:
+                if instrumentation.is_enabled():
+                    instrumentation.record("omdb", "cache hit", time.perf_counter() - start)
+                return data
+
+        with instrumentation.timed("omdb", "request (cache miss)"):
+            data = self._request(params, limiter)
+        if self.cache is not None:
+            self.cache.put(params, data)
+        return data
+
+    def _request(self, params, limiter=None):
+        """Performs the HTTP request, retrying connection errors, timeouts, 429 and 5xx."""
+        if not self.api_key:
+            raise OfflineError("Not found offline, and OMDB_API_KEY is not set in the .env file")
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                limiter.wait()
+            try:
+                response = self.session.get(OMDB_BASE_URL, params={**params, "apikey": self.api_key},
+                                            timeout=self.timeout)
+            except (ConnectionError, Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    def _backoff(self, attempt, retry_after=None):
+        """Returns the delay before the next attempt: exponential backoff with full jitter."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+
+def get_client():
+    """Returns the shared OMDb client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = OmdbClient(cache=get_cache(), mirror=get_mirror())
+    return _client
+
+
+def parse_movie_details(movie_data):
+    """Converts an OMDb details response into keyword arguments for MovieLibrary.add_movie."""
+    try:
+        rating = float(movie_data.get("Ratings", [])[0]["Value"].split('/')[0])
+    except (IndexError, KeyError, ValueError):
+        rating = None
+
+    return {
+        "title": movie_data["Title"],
+        "year": int(str(movie_data["Year"])[:4]),
+        "rating": rating,
+        "director": movie_data.get("Director"),
+        "cover_art": movie_data.get("Poster"),
+        "link": f"https://www.imdb.com/title/{movie_data['imdbID']}/",
+    }
+
 
-    if not api_key:
-        raise ValueError("OMDB_API_KEY not found in .env file")
+def choose_movie_api():
+    """Searches for movies using the OMDb API and returns the search result the user picks, or None."""
+    client = get_client()
 
     search_query = input("What movie do you want to add: ").strip()
     if not search_query:
         print("Insert a valid query.")
         return None
 
-    url = build_url(api_key, s=search_query)
-    response = requests.get(url)
-
-    if response.status_code != 200:
+    try:
+        data = client.get(s=search_query)
+    except OfflineError:
+        print("No movies found offline.")
+        return None
+    except RequestException:
         print("Error fetching data from OMDb API")
         return None
 
-    data = response.json()
-
     if data.get("Response") != "True":
         print("No movies found.")
         return None
@@ -56,34 +197,30 @@ def search_movies_api():
             if choice == 0:
                 return None
             elif 1 <= choice <= len(movies):
-                movie_details = get_movie_details_api(movies[choice - 1]["Title"])
-                return movie_details
+                return movies[choice - 1]
             else:
                 print("Invalid selection. Try again.")
         except ValueError:
             print("Please enter a valid number.")
 
 
-def get_movie_details_api(movie_title):
-    """Gets the details of a movie using the OMDb API."""
-    load_dotenv()  # Load API key from .env file
-    api_key = os.getenv("OMDB_API_KEY")
+def search_movies_api():
+    """Searches for movies using the OMDb API and returns the details of the one the user picks."""
+    movie = choose_movie_api()
+    if movie is None:
+        return None
+    return get_movie_details_api(movie["Title"], movie.get("imdbID"))
 
-    if not api_key:
-        raise ValueError("OMDB_API_KEY not found in .env file")
 
-    url = build_url(api_key, t=movie_title)
+def get_movie_details_api(movie_title, imdb_id=None):
+    """Gets the details of a movie using the OMDb API, by IMDb ID when one is known."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
+        data = get_client().get(i=imdb_id) if imdb_id else get_client().get(t=movie_title)
+    except OfflineError:
+        print(f"'{movie_title}' was not found offline.")
+        return None
     except RequestException as e:
         print(f"Error connecting to OMDb API: {e}")
         return None
 
-    if response.status_code != 200:
-        print("Error fetching data from OMDb API")
-        return None
-
-    data = response.json()
-
     return data
@@ -0,0 +1,156 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models.engine import DEFAULT_DB_URL
+from models.movie import MovieLibrary, WRITE_OPERATIONS
+
+
+READ_OPERATIONS = ("list", "stats", "generate_site")
+DEFAULT_WORKERS = 4
+DEFAULT_LIST_LIMIT = 50
+
+
+def read_operations(lines):
+    """Parses JSONL operations, returning (line number, operation) pairs and (line number, error) pairs."""
+    operations = []
+    errors = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            op = json.loads(line)
+        except ValueError as e:
+            errors.append((number, f"Invalid JSON: {e}"))
+            continue
+        if not isinstance(op, dict) or not op.get("user"):
+            errors.append((number, "Operation needs a 'user'"))
+        elif op.get("op") not in WRITE_OPERATIONS + READ_OPERATIONS:
+            errors.append((number, f"Unknown operation '{op.get('op')}'"))
+        else:
+            operations.append((number, op))
+    return operations, errors
+
+
+def group_steps(operations):
+    """Splits one user's operations into steps, merging consecutive writes into a single step."""
+    steps = []
+    for number, op in operations:
+        if op["op"] in WRITE_OPERATIONS and steps and steps[-1][0] == "write":
+            steps[-1][1].append((number, op))
+        else:
+            steps.append(("write" if op["op"] in WRITE_OPERATIONS else "read", [(number, op)]))
+    return steps
+
+
+def run_read(library, op):
+    """Runs a read operation and returns its JSON-serializable result."""
+    user = op["user"]
+    if op["op"] == "list":
+        after = op.get("after")
+        year_range = op.get("year_range")
+        movies, cursor = library.query_movies(
+            user,
+            min_rating=op.get("min_rating"),
+            year_range=tuple(year_range) if year_range else None,
+            order_by=op.get("order_by", "title"),
+            limit=op.get("limit", DEFAULT_LIST_LIMIT),
+            after=tuple(after) if after else None,
+        )
+        return {"movies": movies, "cursor": cursor}
+    if op["op"] == "stats":
+        return library.get_rating_stats(user)
+
+    from generate_website import CARD_COLUMNS, DEFAULT_PAGE_SIZE, get_output_file, write_pages
+    page_size = op.get("page_size", DEFAULT_PAGE_SIZE)
+    pages = write_pages(user, library.iter_movies(user, columns=CARD_COLUMNS), page_size)
+    return {"pages": pages, "file": get_output_file(user)}
+
+
+def run_user(library, user, operations):
+    """Runs one user's operations in order; returns a result dict per operation."""
+    results = []
+    for kind, step in group_steps(operations):
+        start = time.perf_counter()
+        try:
+            if kind == "write":
+                outcomes = library.apply_writes(user, [op for _, op in step])
+            else:
+                outcomes = [run_read(library, step[0][1])]
+        except Exception as e:
+            outcomes = None
+            error = str(e)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        for index, (number, op) in enumerate(step):
+            result = {"line": number, "user": user, "op": op["op"], "elapsed_ms": elapsed_ms}
+            if "id" in op:
+                result["id"] = op["id"]
+            if outcomes is None:
+                result.update(status="error", error=error)
+            else:
+                result.update(status="ok", result=outcomes[index])
+            results.append(result)
+    return results
+
+
+def run_batch(lines, library, workers=DEFAULT_WORKERS):
+    """Runs JSONL operations, one user per worker, and returns the results in input order."""
+    operations, errors = read_operations(lines)
+    by_user = {}
+    for number, op in operations:
+        by_user.setdefault(op["user"], []).append((number, op))
+
+    results = [{"line": number, "status": "error", "error": error} for number, error in errors]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_user, library, user, ops) for user, ops in by_user.items()]
+        for future in futures:
+            results.extend(future.result())
+    results.sort(key=lambda result: result["line"])
+    return results
+
+
+def write_results(f, results):
+    """Writes results as JSONL, one object per line."""
+    for result in results:
+        f.write(json.dumps(result) + "\n")
+
+
+def main():
+    """Runs a batch of operations from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Run movie library operations from a JSONL file without the interactive menus. "
+                    'Each line is an object such as {"user": "admin", "op": "add", "title": "Alien", '
+                    '"year": 1979, "rating": 8.5}; ops are add, update, remove, list, stats and generate_site.')
+    parser.add_argument("path", nargs="?", default="-", help="JSONL file of operations (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="File the JSONL results are written to (default: stdout)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Users processed in parallel")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+
+    if args.path == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+    start = time.perf_counter()
+    results = run_batch(lines, MovieLibrary(args.db_url), workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    if args.output == "-":
+        write_results(sys.stdout, results)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            write_results(f, results)
+
+    failed = sum(result["status"] == "error" for result in results)
+    rate = len(results) / elapsed if elapsed else 0.0
+    print(f"{len(results)} operations in {elapsed:.2f}s ({rate:.0f} ops/s), {failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
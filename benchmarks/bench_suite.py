@@ -0,0 +1,279 @@
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+WORDS = ["the", "last", "dark", "night", "return", "city", "king", "love", "war", "star", "blue", "house",
+         "dead", "secret", "island", "river", "ghost", "summer", "winter", "empire", "shadow", "dream"]
+DIRECTORS = ["Wes Anderson", "John Ford", "Agnes Varda", "Hayao Miyazaki", "Spike Jonze", "Jane Campion"]
+HEAVY_USER = "bench_heavy"
+INSERT_CHUNK = 10000
+
+
+class StubOmdbClient:
+    """Stands in for OmdbClient, answering every lookup locally with synthetic data.
+
+    Search results get fresh IMDb IDs from first_id on, past the ones populate seeds into the
+    catalog, so picking one always goes through the details lookup.
+    """
+    def __init__(self, seed, first_id):
+        self.random = random.Random(seed)
+        self.next_id = first_id
+
+    def new_imdb_id(self):
+        """Returns an IMDb ID that is neither seeded nor returned before."""
+        self.next_id += 1
+        return f"tt{self.next_id - 1:07d}"
+
+    def get(self, **params):
+        """Returns an OMDb-shaped response for a search (s=), title (t=) or id (i=) lookup."""
+        if "s" in params:
+            return {"Response": "True", "Search": [
+                {"Title": f"{params['s'].title()} {index}", "Year": "2001", "imdbID": self.new_imdb_id()}
+                for index in range(1, 6)
+            ]}
+        title = params.get("t") or f"Movie {params.get('i')}"
+        return {
+            "Response": "True",
+            "Title": f"{title} #{self.random.randrange(10 ** 9)}",
+            "Year": str(self.random.randint(1920, 2024)),
+            "Director": self.random.choice(DIRECTORS),
+            "Poster": "https://example.com/poster.jpg",
+            "imdbID": params.get("i") or self.new_imdb_id(),
+            "Ratings": [{"Source": "Internet Movie Database", "Value": f"{self.random.uniform(1, 10):.1f}/10"}],
+        }
+
+
+def random_title(rng, index):
+    """Returns a synthetic movie title that is unique through its index."""
+    return f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()} {index}"
+
+
+def movie_rows(rng, user_id, index):
+    """Returns the catalog row and the user_movies row of one synthetic movie for a bulk insert."""
+    catalog_row = {
+        "id": index + 1,
+        "imdb_id": f"tt{index:07d}",
+        "title": random_title(rng, index),
+        "year": rng.randint(1920, 2024),
+        "director": rng.choice(DIRECTORS),
+        "cover_art": "https://example.com/poster.jpg",
+        "link": f"https://www.imdb.com/title/tt{index:07d}/",
+    }
+    user_row = {
+        "user_id": user_id,
+        "catalog_id": index + 1,
+        "rating": round(rng.uniform(0, 10), 1),
+        "title": catalog_row["title"],
+        "year": catalog_row["year"],
+    }
+    return catalog_row, user_row
+
+
+def populate(engine, users, movies, heavy_movies, seed):
+    """Fills the scratch database with seeded users and movies; returns the elapsed seconds."""
+    from sqlalchemy import insert
+    from models.movie import CatalogEntry, UserMovie
+    from models.user import User
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    password_hash = User.hash_password("bench")
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{"username": HEAVY_USER, "password_hash": password_hash}] + [
+            {"username": f"bench_user_{index}", "password_hash": password_hash} for index in range(users)
+        ])
+        user_ids = [user_id for (user_id,) in connection.exec_driver_sql("SELECT id FROM users ORDER BY id")]
+        heavy_id, other_ids = user_ids[0], user_ids[1:]
+
+        catalog_rows, user_rows = [], []
+        for index in range(heavy_movies + movies):
+            user_id = heavy_id if index < heavy_movies or not other_ids else rng.choice(other_ids)
+            catalog_row, user_row = movie_rows(rng, user_id, index)
+            catalog_rows.append(catalog_row)
+            user_rows.append(user_row)
+            if len(user_rows) == INSERT_CHUNK:
+                connection.execute(insert(CatalogEntry), catalog_rows)
+                connection.execute(insert(UserMovie), user_rows)
+                catalog_rows, user_rows = [], []
+        if user_rows:
+            connection.execute(insert(CatalogEntry), catalog_rows)
+            connection.execute(insert(UserMovie), user_rows)
+    return time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def scripted_input(answers):
+    """Feeds menu prompts from a list of answers and silences their output."""
+    answers = iter(answers)
+    original = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original
+
+
+def measure(name, function, repeat, results):
+    """Runs a function `repeat` times and records its timings in seconds."""
+    timings = []
+    for run in range(repeat):
+        start = time.perf_counter()
+        function(run)
+        timings.append(time.perf_counter() - start)
+    results[name] = {
+        "runs": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+    print(f"{name:<32} median {results[name]['median'] * 1000:10.2f} ms   min {results[name]['min'] * 1000:10.2f} ms")
+
+
+def run_benchmarks(repeat, seed, first_imdb_id):
+    """Times the library, menu and site generator paths against the populated database."""
+    import api_connection
+    import generate_website
+    import movie_lib_menu
+    from models.movie import MovieLibrary
+
+    api_connection._client = StubOmdbClient(seed, first_imdb_id)
+    library = MovieLibrary()
+    rng = random.Random(seed + 1)
+    results = {}
+
+    def add_movie(run):
+        library.add_movie(f"Bench Added {run}", 2000, 7.5, director="Bench", username=HEAVY_USER)
+
+    def update_movie(run):
+        library.update_movie(f"Bench Added {run}", HEAVY_USER, rating=rng.uniform(0, 10))
+
+    def remove_movie(run):
+        with contextlib.redirect_stdout(io.StringIO()):
+            library.remove_movie(f"Bench Added {run}", HEAVY_USER)
+
+    def menu_add_movie(run):
+        with scripted_input(["bench query", "1"]):
+            movie_lib_menu.add_movie(HEAVY_USER)
+
+    def show_stats(run):
+        with scripted_input([]):
+            movie_lib_menu.show_stats(HEAVY_USER)
+
+    def filter_movies(run):
+        with scripted_input(["7.5", "1980", "2010"]):
+            movie_lib_menu.filter_movies(HEAVY_USER)
+
+    def search_hit(run):
+        with scripted_input([rng.choice(WORDS)]):
+            movie_lib_menu.search_movie(HEAVY_USER)
+
+    def search_suggest(run):
+        with scripted_input(["drak nigth retrun"]):
+            movie_lib_menu.search_movie(HEAVY_USER)
+
+    def generate_html(run):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_website.generate_html(HEAVY_USER)
+
+    measure("MovieLibrary.add_movie", add_movie, repeat, results)
+    measure("MovieLibrary.get_movies_as_dict", lambda run: library.get_movies_as_dict(HEAVY_USER), repeat, results)
+    measure("MovieLibrary.update_movie", update_movie, repeat, results)
+    measure("MovieLibrary.remove_movie", remove_movie, repeat, results)
+    measure("menu.add_movie (stub OMDb)", menu_add_movie, repeat, results)
+    measure("menu.show_stats", show_stats, repeat, results)
+    measure("menu.filter_movies", filter_movies, repeat, results)
+    measure("menu.search_movie (hit)", search_hit, repeat, results)
+    measure("menu.search_movie (suggest)", search_suggest, repeat, results)
+    measure("generate_website.generate_html", generate_html, repeat, results)
+    return results
+
+
+def current_commit():
+    """Returns the git commit of the repository, or None outside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints each benchmark's median relative to a previous results file."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old:
+            print(f"  {name:<32} {result['median'] / old['median']:6.2f}x")
+
+
+def main():
+    """Populates a scratch database, runs the benchmarks and saves the results as JSON."""
+    parser = argparse.ArgumentParser(description="Benchmark the movie library on synthetic data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--movies", type=int, default=100000, help="Movies spread across the users")
+    parser.add_argument("--heavy-movies", type=int, default=10000,
+                        help=f"Movies owned by {HEAVY_USER}, the user every operation is timed on")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Point every module at the scratch database before any of them is imported
+        os.environ["MOVIES_DB_URL"] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+        os.chdir(scratch)
+
+        import generate_website
+        from models.engine import dispose_all, get_engine
+        generate_website.INPUT_HTML_FILE = os.path.join(REPO_DIR, "index_template.html")
+
+        populate_seconds = populate(get_engine(), args.users, args.movies, args.heavy_movies, args.seed)
+        print(f"Populated {args.users} users and {args.movies + args.heavy_movies} movies "
+              f"in {populate_seconds:.1f}s\n")
+        results = run_benchmarks(args.repeat, args.seed, args.movies + args.heavy_movies)
+        dispose_all()
+
+    report = {
+        "meta": {
+            "commit": current_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "movies": args.movies,
+            "heavy_movies": args.heavy_movies,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "populate_seconds": populate_seconds,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PROMPT = b"Enter your choice: "
+DEFAULT_BUDGET = 0.25  # Seconds from process start to the login menu prompt
+DEFAULT_RUNS = 5
+
+
+def time_to_first_prompt(env):
+    """Starts main.py in a fresh interpreter and returns the seconds until the first prompt appears."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "main.py"], cwd=REPO_DIR, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    try:
+        while FIRST_PROMPT not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("main.py exited before showing its first prompt")
+            output += chunk
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def slowest_imports(env, count=10):
+    """Returns the imports with the largest cumulative time when loading main, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    """Measures cold start to the first prompt and fails if the median exceeds the budget."""
+    parser = argparse.ArgumentParser(description="Check the startup time of the CLI against a budget.")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET", DEFAULT_BUDGET)),
+                        help="Maximum median seconds to the first prompt")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Keep the real movies.db out of the measurement in case startup ever touches it
+        env = dict(os.environ, MOVIES_DB_URL=f"sqlite:///{os.path.join(scratch, 'startup.db')}")
+        timings = [time_to_first_prompt(env) for _ in range(args.runs)]
+        imports = slowest_imports(env)
+
+    median = statistics.median(timings)
+    print(f"Time to first prompt: median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms over {args.runs} runs")
+    print("Slowest imports (cumulative):")
+    for microseconds, name in imports:
+        print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+    if median > args.budget:
+        print(f"FAIL: startup exceeds the {args.budget * 1000:.0f} ms budget")
+        sys.exit(1)
+    print(f"OK: within the {args.budget * 1000:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
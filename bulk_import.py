@@ -0,0 +1,200 @@
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_connection import get_client, parse_movie_details
+from models.engine import DEFAULT_DB_URL
+from models.movie import MovieLibrary
+from models.user import require_user_id
+
+
+IMDB_ID_PATTERN = re.compile(r"^tt\d{7,}$")
+DEFAULT_WORKERS = 8
+DEFAULT_RATE_LIMIT = 5  # OMDb requests per second
+DEFAULT_BATCH_SIZE = 100
+
+
+class RateLimiter:
+    """Spaces out calls across threads so that at most `rate` happen per second."""
+    def __init__(self, rate):
+        """Initializes the limiter; a rate of None or 0 disables limiting."""
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the caller is allowed to make its next call."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def parse_entry(line):
+    """Parses one line of an import file into an entry; raises ValueError if it is malformed."""
+    if line.startswith("{"):
+        record = json.loads(line)
+        entry = {
+            "title": record.get("title") or record.get("Title"),
+            "imdb_id": record.get("imdb_id") or record.get("imdbID"),
+            "year": record.get("year") or record.get("Year"),
+        }
+        if record.get("rating") is not None:
+            entry["rating"] = float(record["rating"])
+        return entry
+    if IMDB_ID_PATTERN.match(line):
+        return {"imdb_id": line}
+    return {"title": line}
+
+
+def read_entries(path):
+    """Reads titles or IMDb IDs from a file, one per line or as JSONL objects.
+
+    Returns a tuple of (entries, failures); malformed lines are reported as failures
+    labelled with their line number instead of aborting the import.
+    """
+    entries = []
+    failures = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entries.append(parse_entry(line))
+            except ValueError as e:  # json.JSONDecodeError is a ValueError too
+                failures.append((f"line {number}", str(e)))
+    return entries, failures
+
+
+def describe(entry):
+    """Returns a short human-readable label for an import entry."""
+    return entry.get("imdb_id") or entry.get("title") or "<empty entry>"
+
+
+def resolve_entry(client, entry, limiter):
+    """Looks up a single entry on OMDb and returns it as add_movie keyword arguments.
+
+    The limiter only throttles real OMDb requests; mirror and cache hits are answered right away.
+    """
+    if entry.get("imdb_id"):
+        params = {"i": entry["imdb_id"]}
+    elif entry.get("title"):
+        params = {"t": entry["title"]}
+        if entry.get("year"):
+            params["y"] = entry["year"]
+    else:
+        raise ValueError("Entry has neither a title nor an IMDb ID")
+
+    data = client.get(limiter=limiter, **params)
+    if data.get("Response") != "True":
+        raise LookupError(data.get("Error", "Movie not found"))
+
+    movie = parse_movie_details(data)
+    if entry.get("rating") is not None:
+        movie["rating"] = entry["rating"]
+    elif movie["rating"] is None:
+        movie["rating"] = 0
+    return movie
+
+
+def import_movies(username, path, library, client=None, workers=DEFAULT_WORKERS,
+                  rate_limit=DEFAULT_RATE_LIMIT, batch_size=DEFAULT_BATCH_SIZE):
+    """Resolves every entry in the file concurrently and adds the results in batches.
+
+    Malformed lines and lookup failures are collected instead of aborting the run. Raises ValueError
+    for an unknown user before any lookup is made. Returns a report dict with the number of entries,
+    imported and skipped movies, failures and elapsed time.
+    """
+    with library.Session() as session:
+        user_id = require_user_id(session, username)
+    client = client or get_client()
+    entries, failures = read_entries(path)
+    limiter = RateLimiter(rate_limit)
+    total = len(entries) + len(failures)
+    start = time.monotonic()
+
+    done = len(failures)
+    imported = 0
+    skipped = 0
+    batch = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(resolve_entry, client, entry, limiter): entry for entry in entries}
+        for future in as_completed(futures):
+            done += 1
+            try:
+                batch.append(future.result())
+            except Exception as e:
+                failures.append((describe(futures[future]), str(e)))
+
+            if len(batch) >= batch_size:
+                inserted, duplicates = library.add_movies(user_id, batch)
+                imported += inserted
+                skipped += duplicates
+                batch = []
+                print_progress(done, total, len(failures), start)
+
+    if batch:
+        inserted, duplicates = library.add_movies(user_id, batch)
+        imported += inserted
+        skipped += duplicates
+    print_progress(done, total, len(failures), start)
+
+    return {
+        "total": total,
+        "imported": imported,
+        "skipped": skipped,
+        "failed": failures,
+        "elapsed": time.monotonic() - start,
+    }
+
+
+def print_progress(done, total, failed, start):
+    """Prints how many entries were resolved so far and the current throughput."""
+    elapsed = time.monotonic() - start
+    rate = done / elapsed if elapsed else 0.0
+    print(f"{done}/{total} resolved - {rate:.1f} titles/s - {failed} failed")
+
+
+def print_report(report):
+    """Prints a summary of an import run, including each failed entry."""
+    print(f"\nImported {report['imported']} of {report['total']} entries "
+          f"in {report['elapsed']:.1f}s ({report['skipped']} already in the library).")
+    if report["failed"]:
+        print(f"{len(report['failed'])} entries could not be imported:")
+        for label, reason in report["failed"]:
+            print(f"  {label}: {reason}")
+
+
+def main():
+    """Runs a bulk import from the command line."""
+    parser = argparse.ArgumentParser(description="Bulk import movies into a user's library.")
+    parser.add_argument("username")
+    parser.add_argument("path", help="File with one title or IMDb ID per line, or JSONL objects")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT,
+                        help="Maximum OMDb requests per second (0 disables the limit)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+
+    library = MovieLibrary(args.db_url)
+    try:
+        report = import_movies(args.username, args.path, library, workers=args.workers,
+                               rate_limit=args.rate_limit, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"Could not import for '{args.username}': {e}")
+        return
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
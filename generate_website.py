@@ -1,34 +1,39 @@
+import argparse
+import functools
+import hashlib
+import json
+from contextlib import contextmanager
+from html import escape
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from models.engine import reset_after_fork
 from models.movie import *
+from models.user import UserHandler
 
 
 INPUT_HTML_FILE = "index_template.html"
 #OUTPUT_HTML_FILE = "index.html"
+MANIFEST_FILE = "site_manifest.json"
 TITLE_PLACEHOLDER = "__TEMPLATE_TITLE__"
 MOVIE_PLACEHOLDER = "__TEMPLATE_MOVIE_GRID__"
-
-
-def get_movie_grid(movies):
-    """Generate an HTML grid from a list of movie dictionaries."""
-    grid = '<ul class="movie-grid">\n'
-
-    for movie in movies:
-
-        grid += get_movie_card(movie)
-
-    grid += '\n</ul>'
-    return grid
+PAGINATION_PLACEHOLDER = "__TEMPLATE_PAGINATION__"
+CARD_COLUMNS = ("title", "year", "cover_art", "link")
+DEFAULT_PAGE_SIZE = 200
 
 
 def get_movie_card(movie):
-    """Generate an HTML card for a single movie."""
+    """Generate an HTML card for a single movie row."""
 
+    title = escape(movie.title)
     card = f"""
             <li class="movie-card">
-                <a href="{movie['link']}" class="movie-card__link">
+                <a href="{escape(movie.link)}" class="movie-card__link">
                     <div class="movie-card__content">
-                        <img src="{movie['cover_art']}" alt="{movie['title']}" style="width:100px;">
-                        <p class="movie-title">{movie['title']}</p>
-                        <p class="movie-year">({movie['year']})</p>
+                        <img src="{escape(movie.cover_art)}" alt="{title}" loading="lazy" style="width:100px;">
+                        <p class="movie-title">{title}</p>
+                        <p class="movie-year">({movie.year})</p>
                        
                     </div>
                 </a>
@@ -37,33 +42,189 @@ def get_movie_card(movie):
     return card
 
 
-def generate_html(user):
-    """Generate an HTML file from the template."""
-    try:
+_library = None
+
+
+def get_library():
+    """Returns this process's MovieLibrary, creating it on first use."""
+    global _library
+    if _library is None:
+        _library = MovieLibrary()
+    return _library
+
+
+def _init_worker():
+    """Makes a worker process open its own connections instead of reusing the parent's."""
+    reset_after_fork()
+
+
+@functools.lru_cache(maxsize=None)
+def load_template():
+    """Read the HTML template once per process."""
+    with open(INPUT_HTML_FILE, "r") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_template():
+    """Split the template once into the HTML before and after the movie grid."""
+    html_template = load_template().replace(TITLE_PLACEHOLDER, "Movie Library")
+    head, tail = html_template.split(MOVIE_PLACEHOLDER, 1)
+    return head, tail
+
+
+def get_output_file(user, page=1):
+    """Return the name of the HTML file generated for a page of a user's library."""
+    if page == 1:
+        return f"index_{user}.html"
+    return f"index_{user}_{page}.html"
+
+
+def get_pagination(user, page, has_next):
+    """Generate the previous/next navigation for a page, or nothing for a single-page library."""
+    if page == 1 and not has_next:
+        return ""
+
+    links = []
+    if page > 1:
+        links.append(f'<a href="{escape(get_output_file(user, page - 1))}" class="pagination__prev">&laquo; Previous</a>')
+    links.append(f'<span class="pagination__page">Page {page}</span>')
+    if has_next:
+        links.append(f'<a href="{escape(get_output_file(user, page + 1))}" class="pagination__next">Next &raquo;</a>')
+    return f'<nav class="pagination">{" ".join(links)}</nav>'
+
+
+@contextmanager
+def open_atomic(path):
+    """Open a temporary file that replaces `path` on success, so readers never see a partial page."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+        try:
+            yield f
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+def write_atomic(path, content):
+    """Write a whole file atomically."""
+    with open_atomic(path) as f:
+        f.write(content)
+
+
+def write_pages(user, movies, page_size=DEFAULT_PAGE_SIZE):
+    """Stream movie cards straight into numbered pages of at most page_size movies each.
+
+    Returns the number of pages written; pages left over from a larger library are removed.
+    """
+    head, tail = parse_template()
+    movies = iter(movies)
+    next_movie = next(movies, None)
+    page = 1
+
+    while True:
+        with open_atomic(get_output_file(user, page)) as f:
+            f.write(head)
+            count = 0
+            while next_movie is not None and count < page_size:
+                f.write(get_movie_card(next_movie))
+                count += 1
+                next_movie = next(movies, None)
+            has_next = next_movie is not None
+            f.write(tail.replace(PAGINATION_PLACEHOLDER, get_pagination(user, page, has_next)))
+        if not has_next:
+            break
+        page += 1
+
+    stale_page = page + 1
+    while os.path.exists(get_output_file(user, stale_page)):
+        os.remove(get_output_file(user, stale_page))
+        stale_page += 1
+    return page
+
+
+def hash_movies(movies, page_size=DEFAULT_PAGE_SIZE):
+    """Return a content hash of a user's movie rows, the template and the page size."""
+    digest = hashlib.sha256(load_template().encode())
+    digest.update(str(page_size).encode())
+    for movie in movies:
+        digest.update(repr(tuple(movie)).encode())
+    return digest.hexdigest()
 
-        library = MovieLibrary("sqlite:///movies.db")
-        movies = library.get_movies_as_dict(username = user)
 
-        with open(INPUT_HTML_FILE, "r") as f:
-            html_template = f.read()
+def generate_html(user, page_size=DEFAULT_PAGE_SIZE):
+    """Generate the HTML pages of a user's library from the template."""
+    try:
+        movies = get_library().iter_movies(user, columns=CARD_COLUMNS)
+        pages = write_pages(user, movies, page_size)
+        print(f"HTML file created successfully ({pages} page{'s' if pages > 1 else ''}).")
 
-        html_template = html_template.replace(TITLE_PLACEHOLDER, "Movie Library")
-        html_template = html_template.replace(MOVIE_PLACEHOLDER, get_movie_grid(movies))
+    except Exception as e:
+        print("An error occurred while generating the HTML: ", e)
 
-        output_file = f"index_{user}.html"
-        with open(output_file, "w") as f:
-            f.write(html_template)
 
-        print("HTML file created successfully.")
+def build_user_site(user, previous_hash=None, page_size=DEFAULT_PAGE_SIZE):
+    """Build one user's pages unless its movies are unchanged; returns (user, hash, built)."""
+    library = get_library()
+    content_hash = hash_movies(library.iter_movies(user, columns=CARD_COLUMNS), page_size)
+    if content_hash == previous_hash and os.path.exists(get_output_file(user)):
+        return user, content_hash, False
 
-    except Exception as e:
-        print("An error occurred while generating the HTML: ", e)
+    write_pages(user, library.iter_movies(user, columns=CARD_COLUMNS), page_size)
+    return user, content_hash, True
 
 
-if __name__ == "__main__":
-    # Initialize the MovieLibrary
-    library = MovieLibrary("sqlite:///movies.db")
-    movies = library.get_movies_as_dict(username='admin')
+def load_manifest():
+    """Load the per-user content hashes recorded by the last build."""
+    try:
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_all_sites(workers=None, force=False, page_size=DEFAULT_PAGE_SIZE):
+    """Build every user's page across a process pool, skipping users whose movies are unchanged.
+
+    Returns a tuple of (built, skipped) usernames.
+    """
+    users = [user.username for user in UserHandler().list_users()]
+    manifest = {} if force else load_manifest()
+
+    built, skipped, new_manifest = [], [], {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        results = executor.map(build_user_site, users, [manifest.get(user) for user in users],
+                               [page_size] * len(users))
+        for user, content_hash, was_built in results:
+            new_manifest[user] = content_hash
+            (built if was_built else skipped).append(user)
+
+    write_atomic(MANIFEST_FILE, json.dumps(new_manifest, indent=2, sort_keys=True))
+    return built, skipped
+
+
+def main():
+    """Generate one user's page, or every user's page with --all."""
+    parser = argparse.ArgumentParser(description="Generate the movie library website.")
+    parser.add_argument("user", nargs="?", help="Generate the page of a single user")
+    parser.add_argument("--all", action="store_true", help="Build the pages of all users")
+    parser.add_argument("--force", action="store_true", help="Rebuild pages even if unchanged")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="Maximum number of movies per page")
+    args = parser.parse_args()
+
+    if args.all:
+        built, skipped = build_all_sites(workers=args.workers, force=args.force, page_size=args.page_size)
+        print(f"Built {len(built)} sites, {len(skipped)} unchanged.")
+    elif args.user:
+        generate_html(args.user, args.page_size)
+    else:
+        parser.print_help()
 
-    print(movies)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import hashlib
+import os
+import shutil
+
+from models.movie import MAX_RATING, MovieLibrary
+
+
+HISTOGRAM_CACHE_DIR = ".histogram_cache"
+DEFAULT_BINS = 10
+RENDER_VERSION = "1"  # Bump when the drawing code changes so cached images are not reused
+
+
+def histogram_key(counts):
+    """Returns the cache key of a histogram: a hash of its binned counts."""
+    payload = f"{RENDER_VERSION}:{','.join(str(count) for count in counts)}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_histogram(counts, path):
+    """Draws a histogram of binned rating counts to a PNG with the non-interactive Agg backend."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    width = MAX_RATING / len(counts)
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.subplots()
+    axes.bar([index * width for index in range(len(counts))], counts, width=width,
+             align="edge", edgecolor="black")
+    axes.set_xlim(0, MAX_RATING)
+    axes.set_xlabel("Ratings")
+    axes.set_ylabel("Number of Movies")
+    axes.set_title("Histogram of Movie Ratings")
+    figure.savefig(path)
+    figure.clear()  # Not registered with pyplot, so it is freed as soon as it goes out of scope
+
+
+def save_histogram(counts, path):
+    """Writes the histogram of the counts to path, reusing a cached image of identical counts."""
+    cached = os.path.join(HISTOGRAM_CACHE_DIR, f"{histogram_key(counts)}.png")
+    if not os.path.exists(cached):
+        os.makedirs(HISTOGRAM_CACHE_DIR, exist_ok=True)
+        temporary = f"{cached}.{os.getpid()}.tmp.png"
+        render_histogram(counts, temporary)
+        os.replace(temporary, cached)
+    shutil.copyfile(cached, path)
+    return path
+
+
+def save_rating_histogram(library, username, path, bins=DEFAULT_BINS):
+    """Saves the rating histogram of one user's library to path."""
+    return save_histogram(library.get_rating_histogram(username, bins), path)
+
+
+def save_all_histograms(library, directory=".", bins=DEFAULT_BINS):
+    """Saves histogram_<user>.png for every user with movies; returns the written paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for username, counts in library.get_rating_histograms(bins).items():
+        paths.append(save_histogram(counts, os.path.join(directory, f"histogram_{username}.png")))
+    return paths
+
+
+def main():
+    """Renders the rating histogram of one user, or of every user with --all."""
+    parser = argparse.ArgumentParser(description="Render movie rating histograms.")
+    parser.add_argument("user", nargs="?", help="Render the histogram of a single user")
+    parser.add_argument("--all", action="store_true", help="Render the histograms of all users")
+    parser.add_argument("--directory", default=".", help="Where to write the PNG files")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    args = parser.parse_args()
+
+    library = MovieLibrary()
+    if args.all:
+        paths = save_all_histograms(library, args.directory, args.bins)
+        print(f"Saved {len(paths)} histograms to {args.directory}.")
+    elif args.user:
+        path = os.path.join(args.directory, f"histogram_{args.user}.png")
+        print(f"Histogram saved as {save_rating_histogram(library, args.user, path, args.bins)}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import argparse
+
+from models.engine import DEFAULT_DB_URL
+from models.mirror import DEFAULT_CHUNK_SIZE, OmdbMirror, load_dump
+
+
+def main():
+    """Loads metadata dumps into the local OMDb mirror from the command line."""
+    parser = argparse.ArgumentParser(description="Load an IMDb-style TSV or a JSONL dump into the local OMDb mirror.")
+    parser.add_argument("path", nargs="+", help="Dump files, loaded in order (e.g. title.basics.tsv then title.ratings.tsv)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--types", help="Comma-separated title types to keep, e.g. movie,tvMovie")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+
+    types = set(args.types.split(",")) if args.types else None
+    for path in args.path:
+        count = load_dump(path, args.db_url, args.chunk_size, types)
+        print(f"Loaded {count} rows from {path}")
+    print(f"The mirror now holds {OmdbMirror(args.db_url).stats()['titles']} titles.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from models import instrumentation
+from models.base import Base
+from models.migrations import upgrade
+
+
+DEFAULT_DB_URL = os.getenv("MOVIES_DB_URL", "sqlite:///movies.db")
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per SQLite connection
+
+_engines = {}
+_session_factories = {}
+_lock = threading.Lock()
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Applies the pragmas every SQLite connection of the application should use."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers no longer block on a writer
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, avoids an fsync per commit
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def get_engine(db_url=DEFAULT_DB_URL):
+    """Returns the process-wide engine for a database URL, creating and migrating the schema once."""
+    with _lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            # Register every model on Base before the schema is created
+            import models.movie, models.omdb_cache, models.mirror, models.user_stats  # noqa: F401
+
+            connect_args = {}
+            if db_url.startswith("sqlite"):
+                connect_args["cached_statements"] = STATEMENT_CACHE_SIZE
+            engine = create_engine(db_url, connect_args=connect_args)
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _configure_sqlite_connection)
+            if instrumentation.is_enabled():
+                instrumentation.instrument_engine(engine)
+
+            Base.metadata.create_all(engine)  # Go through all ORM models and create the tables they define
+            upgrade(engine)  # Brings indexes and constraints of existing databases up to date
+            _engines[db_url] = engine
+            _session_factories[db_url] = sessionmaker(bind=engine)
+        return engine
+
+
+def get_session_factory(db_url=DEFAULT_DB_URL):
+    """Returns the shared session factory bound to the engine of a database URL."""
+    get_engine(db_url)
+    return _session_factories[db_url]
+
+
+def iter_engines():
+    """Returns the engines created so far."""
+    with _lock:
+        return list(_engines.values())
+
+
+def reset_after_fork():
+    """Drops pooled connections inherited from a parent process without closing them."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+
+
+def dispose_all():
+    """Closes every engine and empties the registry."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
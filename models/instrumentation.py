@@ -0,0 +1,242 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+
+
+_enabled = os.getenv("MOVIE_INSTRUMENTATION", "") not in ("", "0")
+_metrics = {}
+_lock = threading.Lock()
+_instrumented_engines = weakref.WeakSet()
+# Query counter of the innermost instrumented operation running in this context
+_current_operation = contextvars.ContextVar("current_operation", default=None)
+
+
+class Metric:
+    """Accumulated timings of one instrumented operation, menu action or OMDb lookup."""
+    __slots__ = ("calls", "seconds", "max_seconds", "queries", "query_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def is_enabled():
+    """Returns True if instrumentation is collecting data."""
+    return _enabled
+
+
+def enable():
+    """Starts collecting data and instruments every engine created so far."""
+    global _enabled
+    _enabled = True
+    from models.engine import iter_engines
+    for engine in iter_engines():
+        instrument_engine(engine)
+
+
+def disable():
+    """Stops collecting data; the hooks that stay installed return immediately."""
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forgets everything recorded so far."""
+    with _lock:
+        _metrics.clear()
+
+
+def record(kind, name, seconds, queries=0, query_seconds=0.0):
+    """Adds one timed call to the metric of the given kind and name."""
+    with _lock:
+        metric = _metrics.get((kind, name))
+        if metric is None:
+            metric = _metrics[(kind, name)] = Metric()
+        metric.calls += 1
+        metric.seconds += seconds
+        metric.max_seconds = max(metric.max_seconds, seconds)
+        metric.queries += queries
+        metric.query_seconds += query_seconds
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if _enabled:
+        connection.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    start_times = connection.info.get("query_start_times")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    counter = _current_operation.get()
+    if counter is not None:
+        counter[0] += 1
+        counter[1] += elapsed
+    record("sql", "all queries", elapsed, 1, elapsed)
+
+
+def instrument_engine(engine):
+    """Installs the query counting hooks on an engine, once."""
+    from sqlalchemy import event
+
+    if engine in _instrumented_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _instrumented_engines.add(engine)
+
+
+def _add_queries(counter, queries):
+    if counter is not None:
+        counter[0] += queries[0]
+        counter[1] += queries[1]
+
+
+@contextlib.contextmanager
+def _operation_scope(name):
+    # Queries of nested operations also count towards the operation that called them
+    parent = _current_operation.get()
+    counter = [0, 0.0]
+    token = _current_operation.set(counter)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_operation.reset(token)
+        _add_queries(parent, counter)
+        record("operation", name, elapsed, counter[0], counter[1])
+
+
+def operation(func):
+    """Decorates a repository method to record its latency and the queries it runs."""
+    name = func.__qualname__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not _enabled:
+                return (yield from func(*args, **kwargs))
+            # Only time the generator while it runs, not while the caller holds it paused at a yield
+            generator = func(*args, **kwargs)
+            counter = [0, 0.0]
+            seconds = 0.0
+            resume, argument = generator.send, None
+            try:
+                while True:
+                    # Each resumption rolls its queries up into whichever operation resumed it
+                    parent = _current_operation.get()
+                    step = [0, 0.0]
+                    token = _current_operation.set(step)
+                    start = time.perf_counter()
+                    try:
+                        item = resume(argument)
+                    except StopIteration as stop:
+                        return stop.value
+                    finally:
+                        seconds += time.perf_counter() - start
+                        _current_operation.reset(token)
+                        _add_queries(counter, step)
+                        _add_queries(parent, step)
+                    try:
+                        resume, argument = generator.send, (yield item)
+                    except BaseException as e:  # Includes GeneratorExit when the caller closes us early
+                        resume, argument = generator.throw, e
+            finally:
+                record("operation", name, seconds, counter[0], counter[1])
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with _operation_scope(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def timed(kind, name):
+    """Records the latency of the enclosed block under the given kind and name."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+
+def snapshot():
+    """Returns the recorded metrics as a {kind: {name: metric dict}} dictionary."""
+    with _lock:
+        result = {}
+        for (kind, name), metric in sorted(_metrics.items()):
+            result.setdefault(kind, {})[name] = metric.as_dict()
+        return result
+
+
+def to_json():
+    """Returns the recorded metrics as a JSON document."""
+    return json.dumps(snapshot(), indent=2)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus():
+    """Returns the recorded metrics in the Prometheus text exposition format."""
+    series = [
+        ("movie_app_calls_total", "counter", "Number of recorded calls", "calls"),
+        ("movie_app_seconds_total", "counter", "Total seconds spent", "seconds"),
+        ("movie_app_seconds_max", "gauge", "Slowest single call in seconds", "max_seconds"),
+        ("movie_app_queries_total", "counter", "SQL queries run", "queries"),
+        ("movie_app_query_seconds_total", "counter", "Seconds spent in SQL", "query_seconds"),
+    ]
+    metrics = snapshot()
+    lines = []
+    for metric_name, metric_type, help_text, field in series:
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for kind, entries in metrics.items():
+            for name, values in entries.items():
+                lines.append(f'{metric_name}{{kind="{_label(kind)}",name="{_label(name)}"}} {values[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """Writes the metrics to a file: JSON for *.json paths, Prometheus text otherwise."""
+    with open(path, "w") as f:
+        f.write(to_json() if path.endswith(".json") else to_prometheus())
+
+
+def print_summary():
+    """Prints a table of the recorded metrics, slowest total time first within each kind."""
+    metrics = snapshot()
+    if not metrics:
+        print("No instrumentation data recorded.")
+        return
+
+    print("\nInstrumentation summary:")
+    print(f"  {'kind':<10}{'name':<40}{'calls':>7}{'total ms':>11}{'avg ms':>9}{'max ms':>9}"
+          f"{'queries':>9}{'sql ms':>9}")
+    for kind, entries in metrics.items():
+        for name, m in sorted(entries.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            print(f"  {kind:<10}{name[:39]:<40}{m['calls']:>7}{m['seconds'] * 1000:>11.1f}"
+                  f"{m['seconds'] * 1000 / m['calls']:>9.2f}{m['max_seconds'] * 1000:>9.2f}"
+                  f"{m['queries']:>9}{m['query_seconds'] * 1000:>9.1f}")
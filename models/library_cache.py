@@ -0,0 +1,269 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from models import instrumentation
+from models.movie import ORDERINGS, MovieLibrary
+from models.user import require_user_id, resolve_user_id
+
+
+DEFAULT_MAX_USERS = 32
+DEFAULT_MAX_ROWS = 200_000  # Movies held across all cached libraries
+
+CACHED_COLUMNS = ("id", "title", "year", "rating", "director", "cover_art", "link")
+
+
+@lru_cache(maxsize=None)
+def row_type(columns):
+    """Returns the named tuple type of rows holding the given columns."""
+    return namedtuple("MovieRow", columns)
+
+
+class UserColumns:
+    """One user's library stored column by column: typed arrays for numbers, lists for strings."""
+    __slots__ = ("ids", "years", "ratings", "titles", "directors", "cover_arts", "links", "orders")
+
+    def __init__(self, rows):
+        """Builds the columns from rows holding the CACHED_COLUMNS."""
+        self.ids = array("q")
+        self.years = array("q")
+        self.ratings = array("d")
+        self.titles = []
+        self.directors = []
+        self.cover_arts = []
+        self.links = []
+        self.orders = {}  # Row positions sorted per query_movies ordering, built on first use
+        for row in rows:
+            self.ids.append(row.id)
+            self.years.append(row.year)
+            self.ratings.append(row.rating)
+            self.titles.append(row.title)
+            self.directors.append(row.director)
+            self.cover_arts.append(row.cover_art)
+            self.links.append(row.link)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, name):
+        """Returns the column holding the values of a movie field."""
+        return {"id": self.ids, "year": self.years, "rating": self.ratings, "title": self.titles,
+                "director": self.directors, "cover_art": self.cover_arts, "link": self.links}[name]
+
+    def as_dict(self, index):
+        """Returns one movie in the dictionary format used throughout the menus."""
+        return {
+            "title": self.titles[index],
+            "year": self.years[index],
+            "rating": self.ratings[index],
+            "director": self.directors[index],
+            "cover_art": self.cover_arts[index],
+            "link": self.links[index],
+        }
+
+    def order(self, order_by):
+        """Returns the row positions sorted like query_movies orders them, ties broken by id."""
+        positions = self.orders.get(order_by)
+        if positions is None:
+            column_name, descending = ORDERINGS[order_by]
+            keys = self.column(column_name)
+            positions = sorted(range(len(self)), key=lambda i: (keys[i], self.ids[i]), reverse=descending)
+            self.orders[order_by] = positions
+        return positions
+
+
+class CachedMovieLibrary:
+    """Read-through cache of per-user libraries in front of a MovieLibrary.
+
+    Whole-library reads (get_movies_as_dict, iter_movies, query_movies, count_movies) are served
+    from an in-memory columnar copy of the user's library, loaded on first use. Writes made
+    through this object invalidate the user's library; writes made elsewhere (another
+    process, the batch runner) are not seen, so the cache is opt-in. Other methods pass through.
+    """
+    def __init__(self, library=None, max_users=DEFAULT_MAX_USERS, max_rows=DEFAULT_MAX_ROWS):
+        """Wraps a library, keeping at most max_users libraries and max_rows movies in memory."""
+        self.library = library or MovieLibrary()
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self.libraries = OrderedDict()
+        self.rows = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by invalidate, so a load that raced an invalidation is not stored
+        self.generations = {}
+        self.generation = 0
+
+    def __getattr__(self, name):
+        return getattr(self.library, name)
+
+    def _user_id(self, username, required=True):
+        """Returns the id of a user given either its id or its username."""
+        with self.library.Session() as session:
+            return require_user_id(session, username) if required else resolve_user_id(session, username)
+
+    def _columns(self, username):
+        """Returns the user's cached columns, loading them on a miss."""
+        start = time.perf_counter()
+        user_id = self._user_id(username)
+        with self.lock:
+            columns = self.libraries.get(user_id)
+            if columns is not None:
+                self.libraries.move_to_end(user_id)
+                self.hits += 1
+            generation = (self.generation, self.generations.get(user_id, 0))
+        if columns is not None:
+            if instrumentation.is_enabled():
+                instrumentation.record("cache", "library hit", time.perf_counter() - start)
+            return columns
+
+        columns = UserColumns(self.library.iter_movies(user_id, columns=CACHED_COLUMNS))
+        with self.lock:
+            self.misses += 1
+            current = (self.generation, self.generations.get(user_id, 0))
+            if current == generation and len(columns) <= self.max_rows:
+                previous = self.libraries.pop(user_id, None)
+                self.rows -= len(previous) if previous is not None else 0
+                self.libraries[user_id] = columns
+                self.rows += len(columns)
+                while len(self.libraries) > self.max_users or self.rows > self.max_rows:
+                    _, evicted = self.libraries.popitem(last=False)
+                    self.rows -= len(evicted)
+                    self.evictions += 1
+        if instrumentation.is_enabled():
+            instrumentation.record("cache", "library miss", time.perf_counter() - start)
+        return columns
+
+    def invalidate(self, username=None):
+        """Drops the cached library of a user, or of every user when no username is given."""
+        user_id = self._user_id(username, required=False) if username is not None else None
+        if username is not None and user_id is None:
+            return
+        with self.lock:
+            if user_id is None:
+                self.libraries.clear()
+                self.rows = 0
+                self.generation += 1
+            else:
+                self.generations[user_id] = self.generations.get(user_id, 0) + 1
+                columns = self.libraries.pop(user_id, None)
+                if columns is not None:
+                    self.rows -= len(columns)
+
+    def stats(self):
+        """Returns hit/miss counters and the size of the cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "users": len(self.libraries),
+            "rows": self.rows,
+        }
+
+    # Reads served from the cache
+
+    def get_movies_as_dict(self, username):
+        """Returns all movies in the library as a list of dictionaries."""
+        columns = self._columns(username)
+        return [columns.as_dict(index) for index in range(len(columns))]
+
+    def iter_movies(self, username, columns=("title", "year", "rating"), batch_size=None):
+        """Yields the user's movies as named tuples of the requested columns, in id order."""
+        if set(columns) - set(CACHED_COLUMNS):
+            yield from self.library.iter_movies(username, columns)
+            return
+        cached = self._columns(username)
+        row = row_type(tuple(columns))
+        for values in zip(*(cached.column(name) for name in columns)):
+            yield row._make(values)
+
+    def count_movies(self, username):
+        """Returns the number of movies in the user's library."""
+        return len(self._columns(username))
+
+    def query_movies(self, username, min_rating=None, year_range=None, order_by="title", limit=50, after=None):
+        """Returns one page of the user's movies like MovieLibrary.query_movies, from the cache."""
+        if order_by not in ORDERINGS:
+            raise ValueError(f"Cannot order movies by '{order_by}'")
+        column_name, descending = ORDERINGS[order_by]
+        cached = self._columns(username)
+        keys = cached.column(column_name)
+        start_year, end_year = year_range if year_range is not None else (None, None)
+
+        page = []
+        for index in cached.order(order_by):
+            if after is not None:
+                position = (keys[index], cached.ids[index])
+                if (position >= tuple(after)) if descending else (position <= tuple(after)):
+                    continue
+            if min_rating is not None and cached.ratings[index] < min_rating:
+                continue
+            if start_year is not None and cached.years[index] < start_year:
+                continue
+            if end_year is not None and cached.years[index] > end_year:
+                continue
+            page.append(index)
+            if len(page) > limit:
+                break
+
+        cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            cursor = (keys[page[-1]], cached.ids[page[-1]])
+        return [cached.as_dict(index) for index in page], cursor
+
+    # Writes, which invalidate the user's cached library
+
+    def add_movie(self, *args, **kwargs):
+        """Adds a movie; without a username keyword every cached library is dropped."""
+        try:
+            return self.library.add_movie(*args, **kwargs)
+        finally:
+            self.invalidate(kwargs.get("username"))
+
+    def add_movies(self, username, movies):
+        """Adds many movies and drops the user's cached library."""
+        try:
+            return self.library.add_movies(username, movies)
+        finally:
+            self.invalidate(username)
+
+    def apply_writes(self, username, operations):
+        """Applies a write batch and drops the user's cached library."""
+        try:
+            return self.library.apply_writes(username, operations)
+        finally:
+            self.invalidate(username)
+
+    def update_movie(self, title, username, **kwargs):
+        """Updates a movie and drops the user's cached library."""
+        try:
+            return self.library.update_movie(title, username, **kwargs)
+        finally:
+            self.invalidate(username)
+
+    def update_movies(self, username, changes):
+        """Updates movies by title and drops the user's cached library."""
+        try:
+            return self.library.update_movies(username, changes)
+        finally:
+            self.invalidate(username)
+
+    def remove_movie(self, title, username):
+        """Removes a movie and drops the user's cached library."""
+        try:
+            return self.library.remove_movie(title, username)
+        finally:
+            self.invalidate(username)
+
+    def remove_movies(self, username, *args, **kwargs):
+        """Removes matching movies and drops the user's cached library."""
+        try:
+            return self.library.remove_movies(username, *args, **kwargs)
+        finally:
+            self.invalidate(username)
@@ -0,0 +1,324 @@
+import re
+
+
+def _has_table(connection, name):
+    """Returns True if the database has a table with the given name."""
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).first() is not None
+
+
+def _add_movie_indexes(connection):
+    """Adds the composite indexes and the (user_id, title, year) uniqueness constraint."""
+    if not _has_table(connection, "movies"):
+        return  # Created after the movies table was split into catalog and user_movies
+    # Older databases may hold duplicates from the read-then-insert check; keep the oldest.
+    connection.exec_driver_sql(
+        "DELETE FROM movies WHERE id NOT IN "
+        "(SELECT MIN(id) FROM movies GROUP BY user_id, title, year)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_movies_user_title_year ON movies (user_id, title, year)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_movies_user_rating ON movies (user_id, rating)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_movies_user_year ON movies (user_id, year)"
+    )
+
+
+def _add_movie_search_index(connection):
+    """Adds an FTS5 index over movie titles and directors, kept in sync with triggers."""
+    if not _has_table(connection, "movies"):
+        return
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+        "title, director, content='movies', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN "
+        "INSERT INTO movies_fts(rowid, title, director) VALUES (new.id, new.title, new.director); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title, director ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director); "
+        "INSERT INTO movies_fts(rowid, title, director) VALUES (new.id, new.title, new.director); "
+        "END"
+    )
+    connection.exec_driver_sql("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+
+
+def _add_mirror_search_index(connection):
+    """Adds the FTS5 index over the titles of the OMDb metadata mirror, rebuilt by each load."""
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS omdb_mirror_fts USING fts5("
+        "title, content='omdb_mirror', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def _split_movies_into_catalog(connection):
+    """Moves the per-user copies of movie metadata into the shared catalog plus user_movies.
+
+    Movies are the same film when their links carry the same IMDb ID or, without one, when
+    title and year match; the oldest copy's metadata wins. Row ids are kept as user_movies ids.
+    The search index moves from movies to the catalog.
+    """
+    if _has_table(connection, "movies"):
+        connection.exec_driver_sql(
+            "CREATE TEMP TABLE movie_keys AS "
+            "SELECT id, user_id, title, year, rating, director, cover_art, link, "
+            "CASE WHEN tail IS NOT NULL THEN substr(tail, 1, instr(tail || '/', '/') - 1) END AS imdb_id "
+            "FROM (SELECT *, CASE WHEN instr(link, '/title/tt') > 0 "
+            "THEN substr(link, instr(link, '/title/tt') + 7) END AS tail "
+            "FROM movies WHERE user_id IS NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO catalog (id, imdb_id, title, year, director, cover_art, link) "
+            "SELECT id, imdb_id, title, year, director, cover_art, link FROM movie_keys WHERE id IN ("
+            "SELECT MIN(id) FROM movie_keys GROUP BY imdb_id, "
+            "CASE WHEN imdb_id IS NULL THEN title END, CASE WHEN imdb_id IS NULL THEN year END)"
+        )
+        connection.exec_driver_sql(
+            "INSERT OR IGNORE INTO user_movies (id, user_id, catalog_id, rating, title, year) "
+            "SELECT m.id, m.user_id, c.id, m.rating, c.title, c.year FROM movie_keys m "
+            "JOIN catalog c ON c.imdb_id = m.imdb_id ORDER BY m.id"
+        )
+        connection.exec_driver_sql(
+            "INSERT OR IGNORE INTO user_movies (id, user_id, catalog_id, rating, title, year) "
+            "SELECT m.id, m.user_id, c.id, m.rating, c.title, c.year FROM movie_keys m "
+            "JOIN catalog c ON c.imdb_id IS NULL AND c.title = m.title AND c.year = m.year "
+            "WHERE m.imdb_id IS NULL ORDER BY m.id"
+        )
+        connection.exec_driver_sql("DROP TABLE movie_keys")
+
+    for trigger in ("movies_fts_insert", "movies_fts_delete", "movies_fts_update"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS movies_fts")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS movies")
+
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5("
+        "title, director, content='catalog', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS catalog_fts_insert AFTER INSERT ON catalog BEGIN "
+        "INSERT INTO catalog_fts(rowid, title, director) VALUES (new.id, new.title, new.director); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS catalog_fts_delete AFTER DELETE ON catalog BEGIN "
+        "INSERT INTO catalog_fts(catalog_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS catalog_fts_update AFTER UPDATE OF title, director ON catalog BEGIN "
+        "INSERT INTO catalog_fts(catalog_fts, rowid, title, director) VALUES ('delete', old.id, old.title, old.director); "
+        "INSERT INTO catalog_fts(rowid, title, director) VALUES (new.id, new.title, new.director); "
+        "END"
+    )
+    connection.exec_driver_sql("INSERT INTO catalog_fts(catalog_fts) VALUES ('rebuild')")
+
+
+def _add_user_stats_triggers(connection):
+    """Keeps user_stats in step with user_movies through triggers and fills it from existing rows."""
+    from models.user_stats import BUCKET_COLUMNS, STATS_COLUMNS, bucket_sql, rebuild
+
+    def add(row):
+        bucket = bucket_sql(f"{row}.rating")
+        values = [f"{row}.user_id", "1", f"{row}.rating", f"{row}.rating", f"{row}.rating"] + [
+            f"(({bucket}) = {index})" for index in range(len(BUCKET_COLUMNS))
+        ]
+        updates = [
+            "movie_count = movie_count + 1",
+            f"rating_sum = rating_sum + {row}.rating",
+            f"min_rating = min(coalesce(min_rating, {row}.rating), {row}.rating)",
+            f"max_rating = max(coalesce(max_rating, {row}.rating), {row}.rating)",
+        ] + [f"{name} = {name} + (({bucket}) = {index})" for index, name in enumerate(BUCKET_COLUMNS)]
+        return (f"INSERT INTO user_stats ({', '.join(STATS_COLUMNS)}) VALUES ({', '.join(values)}) "
+                f"ON CONFLICT(user_id) DO UPDATE SET {', '.join(updates)}; ")
+
+    def remove(row):
+        bucket = bucket_sql(f"{row}.rating")
+        remaining = f"FROM user_movies WHERE user_id = {row}.user_id"
+        updates = [
+            "movie_count = movie_count - 1",
+            f"rating_sum = rating_sum - {row}.rating",
+            # The (user_id, rating) index makes these lookups cheap when an extreme is removed
+            f"min_rating = CASE WHEN {row}.rating <= min_rating THEN (SELECT MIN(rating) {remaining}) "
+            f"ELSE min_rating END",
+            f"max_rating = CASE WHEN {row}.rating >= max_rating THEN (SELECT MAX(rating) {remaining}) "
+            f"ELSE max_rating END",
+        ] + [f"{name} = {name} - (({bucket}) = {index})" for index, name in enumerate(BUCKET_COLUMNS)]
+        return f"UPDATE user_stats SET {', '.join(updates)} WHERE user_id = {row}.user_id; "
+
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS user_stats_insert AFTER INSERT ON user_movies BEGIN {add('new')}END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS user_stats_delete AFTER DELETE ON user_movies BEGIN {remove('old')}END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_stats_update AFTER UPDATE OF user_id, rating ON user_movies "
+        f"BEGIN {remove('old')}{add('new')}END"
+    )
+    rebuild(connection)
+
+
+def _columns(connection, table_name):
+    """Returns the names of a table's columns."""
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+
+
+def _copy_titles_into_user_movies(connection):
+    """Copies title and year onto user_movies and restores the (user_id, title, year) uniqueness.
+
+    Per-user title lookups and title or year ordering then run on user_movies indexes instead of
+    joining every movie of the user to the catalog. Also adds catalog.source_id, which links a
+    user's edited copy of a film to the entry it was copied from.
+    """
+    if "title" not in _columns(connection, "user_movies"):
+        connection.exec_driver_sql("ALTER TABLE user_movies ADD COLUMN title VARCHAR")
+        connection.exec_driver_sql("ALTER TABLE user_movies ADD COLUMN year INTEGER")
+        connection.exec_driver_sql(
+            "UPDATE user_movies SET (title, year) = "
+            "(SELECT title, year FROM catalog WHERE catalog.id = user_movies.catalog_id)"
+        )
+        # An IMDb and a non-IMDb entry of the same film could both end up in a library; keep the oldest
+        connection.exec_driver_sql(
+            "DELETE FROM user_movies WHERE id NOT IN "
+            "(SELECT MIN(id) FROM user_movies GROUP BY user_id, title, year)"
+        )
+    if "source_id" not in _columns(connection, "catalog"):
+        connection.exec_driver_sql("ALTER TABLE catalog ADD COLUMN source_id INTEGER REFERENCES catalog (id)")
+
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_movies_user_title_year ON user_movies (user_id, title, year)"
+    )
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_user_movies_user_title ON user_movies (user_id, title)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_user_movies_user_year ON user_movies (user_id, year)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_user_movies_catalog ON user_movies (catalog_id)")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_catalog_source ON catalog (source_id)")
+
+
+# Each entry upgrades the schema by one version; the position + 1 is the version number.
+MIGRATIONS = [
+    _add_movie_indexes,
+    _add_movie_search_index,
+    _add_mirror_search_index,
+    _split_movies_into_catalog,
+    _add_user_stats_triggers,
+    _copy_titles_into_user_movies,
+]
+
+
+def get_schema_version(connection):
+    """Returns the schema version stored in the SQLite user_version pragma."""
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(engine):
+    """Applies every pending migration in place, in a single transaction."""
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {number}")
+
+
+HOT_QUERIES = {
+    "find movie by title (update/remove)":
+        "SELECT * FROM user_movies JOIN catalog ON catalog.id = user_movies.catalog_id "
+        "WHERE user_movies.user_id = 1 AND user_movies.title = 'x'",
+    "catalog lookup by IMDb ID (add)":
+        "SELECT id FROM catalog WHERE imdb_id = 'tt0000001'",
+    "catalog lookup by title and year (add)":
+        "SELECT id FROM catalog WHERE title = 'x' AND year = 2000",
+    "duplicate check (add)":
+        "SELECT title, year FROM user_movies WHERE user_id = 1 AND title = 'x' AND year = 2000",
+    "edited copy check (add)":
+        "SELECT user_movies.id FROM user_movies WHERE user_movies.user_id = 1 AND user_movies.catalog_id IN "
+        "(SELECT copy.id FROM catalog AS copy JOIN catalog AS source ON source.id = copy.source_id "
+        "WHERE source.title = 'x' AND source.year = 2000)",
+    "reusable edited copies (update)":
+        "SELECT * FROM catalog WHERE source_id IN (1, 2) AND NOT EXISTS "
+        "(SELECT 1 FROM user_movies WHERE user_id = 1 AND catalog_id = catalog.id)",
+    "owners of a catalog entry (pruning copies)":
+        "SELECT id FROM user_movies WHERE catalog_id = 1",
+    "list user's movies":
+        "SELECT * FROM user_movies JOIN catalog ON catalog.id = user_movies.catalog_id "
+        "WHERE user_movies.user_id = 1",
+    "page of user's movies by title":
+        "SELECT * FROM user_movies JOIN catalog ON catalog.id = user_movies.catalog_id "
+        "WHERE user_movies.user_id = 1 AND (user_movies.title, user_movies.id) > ('x', 1) "
+        "ORDER BY user_movies.title, user_movies.id LIMIT 51",
+    "page of user's movies by rating":
+        "SELECT * FROM user_movies JOIN catalog ON catalog.id = user_movies.catalog_id "
+        "WHERE user_movies.user_id = 1 AND (user_movies.rating, user_movies.id) < (5, 1) "
+        "ORDER BY user_movies.rating DESC, user_movies.id DESC LIMIT 51",
+    "page of user's movies in a year range":
+        "SELECT * FROM user_movies JOIN catalog ON catalog.id = user_movies.catalog_id "
+        "WHERE user_movies.user_id = 1 AND user_movies.year BETWEEN 1990 AND 2000 "
+        "AND (user_movies.year, user_movies.id) > (1990, 1) ORDER BY user_movies.year, user_movies.id LIMIT 51",
+    "full-text search":
+        "SELECT * FROM catalog_fts JOIN catalog ON catalog.id = catalog_fts.rowid "
+        "JOIN user_movies ON user_movies.catalog_id = catalog.id "
+        "WHERE catalog_fts MATCH 'x*' AND user_movies.user_id = 1 ORDER BY bm25(catalog_fts)",
+    "OMDb mirror title lookup":
+        "SELECT * FROM omdb_mirror WHERE title_key = 'x' AND year = 2000",
+}
+
+# Hot queries that are meant to read the user's whole library; every other one must narrow its
+# user_movies index search beyond user_id, or it walks the whole library (e.g. to filter by title).
+WHOLE_LIBRARY_QUERIES = {"list user's movies"}
+WHOLE_LIBRARY_STEP = re.compile(r"^SEARCH user_movies USING (COVERING )?INDEX \w+ \(user_id=\?\)$")
+
+
+def explain_hot_queries(engine):
+    """Returns the SQLite query plan of each hot query, keyed by a description."""
+    plans = {}
+    with engine.connect() as connection:
+        for name, sql in HOT_QUERIES.items():
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+            plans[name] = [row[-1] for row in rows]
+    return plans
+
+
+def plan_problem(name, steps):
+    """Returns why a hot query's plan is too slow ("SCAN", "SORT" or "WALK"), or None if it is fine.
+
+    Sorting is only accepted for full-text matches, which are bounded by the search terms.
+    """
+    full_text = any("VIRTUAL TABLE INDEX" in step for step in steps)
+    for step in steps:
+        if step.startswith("SCAN") and "VIRTUAL TABLE INDEX" not in step:
+            return "SCAN"
+        if step.startswith("USE TEMP B-TREE FOR ORDER BY") and not full_text:
+            return "SORT"
+        if name not in WHOLE_LIBRARY_QUERIES and WHOLE_LIBRARY_STEP.match(step):
+            return "WALK"
+    return None
+
+
+def check_query_plans(engine):
+    """Prints the plan of each hot query and returns False if any of them scans, sorts or walks a whole table."""
+    ok = True
+    for name, steps in explain_hot_queries(engine).items():
+        problem = plan_problem(name, steps)
+        ok = ok and problem is None
+        print(f"{problem or 'OK':<4} {name}: {'; '.join(steps)}")
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+    from models.movie import MovieLibrary
+
+    library = MovieLibrary(*sys.argv[1:2])
+    sys.exit(0 if check_query_plans(library.engine) else 1)
@@ -0,0 +1,231 @@
+import csv
+import json
+import re
+import time
+
+from sqlalchemy import (Column, Integer, String, Float, Index, bindparam, column, func, literal_column, select, table,
+                        update)
+from sqlalchemy.dialects.sqlite import insert
+
+from models.base import Base
+from models.engine import DEFAULT_DB_URL, get_engine, get_session_factory
+
+
+DEFAULT_CHUNK_SIZE = 5000
+SEARCH_LIMIT = 10  # OMDb returns ten results per search page
+
+# Dump column names (IMDb TSV, OMDb JSON and plain names) mapped to mirror columns
+FIELD_ALIASES = {
+    "imdb_id": ("imdb_id", "imdbID", "tconst"),
+    "title": ("title", "Title", "primaryTitle"),
+    "year": ("year", "Year", "startYear"),
+    "director": ("director", "Director"),  # title.crew.tsv "directors" holds nconst IDs, not names
+    "rating": ("rating", "imdbRating", "averageRating"),
+    "votes": ("votes", "imdbVotes", "numVotes"),
+    "poster": ("poster", "Poster"),
+    "type": ("type", "Type", "titleType"),
+}
+MISSING_VALUES = {"", "\\N", "N/A"}
+
+# Full-text index over mirrored titles, rebuilt after each load (see models/migrations.py)
+mirror_fts = table("omdb_mirror_fts", column("rowid"), column("title"))
+
+
+class MirrorTitle(Base):
+    """Represents a title in the local OMDb metadata mirror."""
+    __tablename__ = "omdb_mirror"
+    __table_args__ = (
+        Index("ix_omdb_mirror_title_key_year", "title_key", "year"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    imdb_id = Column(String, unique=True, nullable=False)
+    title = Column(String, nullable=False)
+    title_key = Column(String, nullable=False)
+    year = Column(Integer)
+    director = Column(String)
+    rating = Column(Float)
+    votes = Column(Integer)
+    poster = Column(String)
+    type = Column(String)
+
+
+def title_key(title):
+    """Returns the normalized form of a title used for exact lookups."""
+    return " ".join(title.lower().split())
+
+
+def _parse_int(value):
+    match = re.match(r"\d+", value.replace(",", "")) if value else None
+    return int(match.group()) if match else None
+
+
+def normalize_record(record):
+    """Converts one dump record into a mirror row, keeping only the fields the record has."""
+    row = {}
+    for name, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in record:
+                value = record[alias]
+                row[name] = None if value is None or str(value).strip() in MISSING_VALUES else str(value).strip()
+                break
+
+    if row.get("year") is not None:
+        row["year"] = _parse_int(row["year"])
+    if row.get("votes") is not None:
+        row["votes"] = _parse_int(row["votes"])
+    if row.get("rating") is not None:
+        try:
+            row["rating"] = float(row["rating"])
+        except ValueError:
+            row["rating"] = None
+    if row.get("title") is not None:
+        row["title_key"] = title_key(row["title"])
+    return row
+
+
+def read_records(path):
+    """Yields the records of a JSONL dump or a TSV dump with a header row, one at a time."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+
+
+def iter_chunks(rows, size):
+    """Groups an iterable into lists of at most size items."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_chunk(session, chunk):
+    """Upserts a chunk of complete rows, or applies a chunk of partial rows (e.g. ratings only) as updates."""
+    if "title" in chunk[0]:
+        statement = insert(MirrorTitle)
+        columns = [name for name in chunk[0] if name != "imdb_id"]
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["imdb_id"],
+                set_={name: statement.excluded[name] for name in columns},
+            ),
+            chunk,
+        )
+        return len(chunk)
+
+    columns = [name for name in chunk[0] if name != "imdb_id"]
+    session.connection().execute(
+        update(MirrorTitle.__table__)
+        .where(MirrorTitle.__table__.c.imdb_id == bindparam("b_imdb_id"))
+        .values({name: bindparam(f"b_{name}") for name in columns}),
+        [{f"b_{name}": value for name, value in row.items()} for row in chunk],
+    )
+    return len(chunk)
+
+
+def load_dump(path, db_url=DEFAULT_DB_URL, chunk_size=DEFAULT_CHUNK_SIZE, types=None):
+    """Streams a TSV or JSONL dump into the mirror in chunks of batched inserts.
+
+    Rows with a title are inserted or replace the existing entry of the same IMDb ID; files
+    without titles, such as IMDb's title.ratings.tsv, update existing entries. `types`
+    optionally restricts the load to title types such as {"movie"}. Returns the number of
+    rows written.
+    """
+    get_engine(db_url)
+    Session = get_session_factory(db_url)
+
+    rows = (normalize_record(record) for record in read_records(path))
+    rows = (row for row in rows if row.get("imdb_id") and len(row) > 1 and ("title" not in row or row["title"]))
+    if types:
+        rows = (row for row in rows if "type" not in row or row["type"] in types)
+
+    written = 0
+    start = time.monotonic()
+    with Session() as session:
+        for chunk in iter_chunks(rows, chunk_size):
+            written += _write_chunk(session, chunk)
+            session.commit()
+            print(f"{written} rows loaded ({written / (time.monotonic() - start):.0f} rows/s)")
+        session.connection().exec_driver_sql("INSERT INTO omdb_mirror_fts(omdb_mirror_fts) VALUES ('rebuild')")
+        session.commit()
+    return written
+
+
+def _search_result(entry):
+    return {"Title": entry.title, "Year": str(entry.year or ""), "imdbID": entry.imdb_id,
+            "Type": entry.type or "movie", "Poster": entry.poster or "N/A"}
+
+
+def _details(entry):
+    ratings = []
+    if entry.rating is not None:
+        ratings.append({"Source": "Internet Movie Database", "Value": f"{entry.rating}/10"})
+    return {
+        "Response": "True",
+        "Title": entry.title,
+        "Year": str(entry.year or ""),
+        "Director": entry.director or "N/A",
+        "Poster": entry.poster or "N/A",
+        "imdbID": entry.imdb_id,
+        "imdbRating": str(entry.rating) if entry.rating is not None else "N/A",
+        "Ratings": ratings,
+        "Type": entry.type or "movie",
+    }
+
+
+class OmdbMirror:
+    """Answers OMDb queries from the local metadata mirror, in the OMDb response format."""
+    def __init__(self, db_url=DEFAULT_DB_URL):
+        """Initializes the mirror with the shared engine of the database."""
+        self.engine = get_engine(db_url)
+        self.Session = get_session_factory(db_url)
+
+    def is_empty(self):
+        """Returns True if no dump has been loaded."""
+        with self.Session() as session:
+            return session.scalar(select(MirrorTitle.id).limit(1)) is None
+
+    def get(self, **params):
+        """Returns the response for an i=, t= (optionally y=) or s= query, or None if the mirror can't answer it."""
+        with self.Session() as session:
+            if params.get("i"):
+                entry = session.scalar(select(MirrorTitle).where(MirrorTitle.imdb_id == params["i"]))
+                return _details(entry) if entry else None
+
+            if params.get("t"):
+                query = select(MirrorTitle).where(MirrorTitle.title_key == title_key(params["t"]))
+                if params.get("y"):
+                    query = query.where(MirrorTitle.year == int(params["y"]))
+                entry = session.scalars(query.order_by(MirrorTitle.votes.desc().nulls_last()).limit(1)).first()
+                return _details(entry) if entry else None
+
+            if params.get("s"):
+                words = re.findall(r"\w+", params["s"])
+                if not words:
+                    return None
+                entries = session.scalars(
+                    select(MirrorTitle)
+                    .join(mirror_fts, mirror_fts.c.rowid == MirrorTitle.id)
+                    .where(literal_column("omdb_mirror_fts").op("MATCH")(" ".join(f'"{word}"*' for word in words)))
+                    .order_by(MirrorTitle.votes.desc().nulls_last(), func.bm25(literal_column("omdb_mirror_fts")))
+                    .limit(SEARCH_LIMIT)
+                ).all()
+                if not entries:
+                    return None
+                return {"Response": "True", "Search": [_search_result(entry) for entry in entries],
+                        "totalResults": str(len(entries))}
+        return None
+
+    def stats(self):
+        """Returns the number of mirrored titles."""
+        with self.Session() as session:
+            return {"titles": session.scalar(select(func.count()).select_from(MirrorTitle))}
+
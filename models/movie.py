@@ -1,117 +1,858 @@
-from sqlalchemy import Column, Integer, String, Float, create_engine, ForeignKey
+import random
+import re
+
+from sqlalchemy import (Column, Integer, String, Float, ForeignKey, Index, bindparam, case, cast, delete, exists,
+                        func, insert, select, tuple_, table, column, literal_column, update)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import aliased, contains_eager, relationship
 
 
 from models.base import Base
-from models.user import User
+from models.user import User, resolve_user_id, require_user_id
+from models.engine import DEFAULT_DB_URL, get_engine, get_session_factory
+from models.instrumentation import operation
+from models.title_index import TitleIndexCache
+from models.user_stats import MAX_RATING, STATS_BUCKETS, UserStats
+
+# Keeps (title, year) IN lists well below SQLite's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 500
+
+# Rows fetched per round-trip when streaming a library
+DEFAULT_BATCH_SIZE = 500
+
+# Sort key column and direction for each query_movies ordering; ties are broken by id.
+ORDERINGS = {
+    "title": ("title", False),
+    "year": ("year", False),
+    "rating": ("rating", True),
+}
+
+# Operations accepted by MovieLibrary.apply_writes and the columns an update may change
+WRITE_OPERATIONS = ("add", "update", "remove")
+UPDATABLE_COLUMNS = ("year", "rating", "director", "cover_art")
+CATALOG_UPDATABLE_COLUMNS = ("year", "director", "cover_art")
+
+# Catalog fields copied into a user's private entry when they edit a film's metadata
+CATALOG_FIELDS = ("title", "year", "director", "cover_art", "link")
+COPY_KEY = CATALOG_FIELDS + ("source_id",)  # Identical copies of the same entry are shared
+
+# Extracts the IMDb ID from links such as https://www.imdb.com/title/tt0119698/
+IMDB_LINK_PATTERN = re.compile(r"/title/(tt\d+)")
+
+
+# Full-text index over catalog titles and directors, maintained by triggers (see models/migrations.py)
+catalog_fts = table("catalog_fts", column("rowid"), column("title"), column("director"))
 
 
-class Movie(Base):
-    """Represents a movie in the database."""
-    __tablename__ = 'movies'
+class CatalogEntry(Base):
+    """Represents a film's metadata, stored once and shared by every user who owns it."""
+    __tablename__ = "catalog"
+    __table_args__ = (
+        Index("ix_catalog_title_year", "title", "year"),
+        Index("ix_catalog_source", "source_id"),
+    )
 
     id = Column(Integer, primary_key=True)
+    imdb_id = Column(String, unique=True)
     title = Column(String, nullable=False)
     year = Column(Integer, nullable=False)
-    rating = Column(Float, nullable=False)
     director = Column(String, default="Unknown")
     cover_art = Column(String, default="Missing")
     link = Column(String, default="Missing")
-    user_id = Column(Integer, ForeignKey("users.id"))
+    source_id = Column(Integer, ForeignKey("catalog.id"))  # Set on a user's edited copy: the entry it was copied from
+
+
+class UserMovie(Base):
+    """Represents a movie in a user's library: a catalog entry plus the user's rating.
+
+    Title and year are copied from the catalog entry, which never changes once created, so
+    per-user lookups, ordering and the (user, title, year) uniqueness run on this table's indexes.
+    """
+    __tablename__ = "user_movies"
+    __table_args__ = (
+        Index("uq_user_movies_user_catalog", "user_id", "catalog_id", unique=True),
+        Index("uq_user_movies_user_title_year", "user_id", "title", "year", unique=True),
+        Index("ix_user_movies_user_title", "user_id", "title"),
+        Index("ix_user_movies_user_year", "user_id", "year"),
+        Index("ix_user_movies_user_rating", "user_id", "rating"),
+        Index("ix_user_movies_catalog", "catalog_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    catalog_id = Column(Integer, ForeignKey("catalog.id"), nullable=False)
+    rating = Column(Float, nullable=False)
+    title = Column(String, nullable=False)
+    year = Column(Integer, nullable=False)
 
     user = relationship("User", back_populates="movies")
+    catalog = relationship("CatalogEntry", lazy="joined")
+
+    director = property(lambda self: self.catalog.director)
+    cover_art = property(lambda self: self.catalog.cover_art)
+    link = property(lambda self: self.catalog.link)
 
     def __str__(self):
         return f"{self.title} ({self.year}), directed by {self.director}"
 
 
+# Columns iter_movies can return, by name; metadata lives in the catalog, rating, title and year per user
+MOVIE_COLUMNS = {
+    "id": UserMovie.id,
+    "user_id": UserMovie.user_id,
+    "catalog_id": UserMovie.catalog_id,
+    "rating": UserMovie.rating,
+    "imdb_id": CatalogEntry.imdb_id,
+    "title": UserMovie.title,
+    "year": UserMovie.year,
+    "director": CatalogEntry.director,
+    "cover_art": CatalogEntry.cover_art,
+    "link": CatalogEntry.link,
+}
+
+
+def movie_to_dict(movie):
+    """Converts a UserMovie into the dictionary format used throughout the menus."""
+    return {
+        "title": movie.title,
+        "year": movie.year,
+        "rating": movie.rating,
+        "director": movie.director,
+        "cover_art": movie.cover_art,
+        "link": movie.link
+    }
+
+
+def imdb_id_from_link(link):
+    """Returns the IMDb ID contained in an IMDb title link, or None."""
+    match = IMDB_LINK_PATTERN.search(link or "")
+    return match.group(1) if match else None
+
+
+def select_user_movies(user_id):
+    """Returns a select of the user's UserMovies with their catalog entries joined in."""
+    return (select(UserMovie)
+            .join(UserMovie.catalog)
+            .options(contains_eager(UserMovie.catalog))
+            .where(UserMovie.user_id == user_id))
+
+
+def find_catalog_entry(session, title, year, imdb_id=None):
+    """Returns the catalog entry of a film by IMDb ID when known, else by title and year, or None."""
+    if imdb_id:
+        return session.scalar(select(CatalogEntry).where(CatalogEntry.imdb_id == imdb_id))
+    return session.scalars(
+        select(CatalogEntry)
+        .where(CatalogEntry.title == title, CatalogEntry.year == year)
+        .order_by(CatalogEntry.imdb_id.is_(None), CatalogEntry.source_id.is_not(None))
+        .limit(1)
+    ).first()
+
+
+def get_or_create_catalog_entry(session, title, year, director=None, cover_art=None, link=None, imdb_id=None):
+    """Returns the film's catalog entry, adding one to the session if the catalog doesn't have it yet."""
+    imdb_id = imdb_id or imdb_id_from_link(link)
+    entry = find_catalog_entry(session, title, int(year), imdb_id)
+    if entry is None:
+        entry = CatalogEntry(
+            imdb_id=imdb_id,
+            title=title,
+            year=int(year),
+            director=director or "Unknown",
+            cover_art=cover_art or "Missing",
+            link=link or "Missing",
+        )
+        session.add(entry)
+        session.flush()
+    return entry
+
+
+def fork_catalog_entries(session, user_id, edits):
+    """Re-points some of a user's movies to copies of their catalog entries with edits applied.
+
+    `edits` is a list of (user movie id, catalog entry, changes) tuples. Shared entries are never
+    modified: an identical copy of the same source that the user doesn't own yet is reused,
+    otherwise the missing copies are added in one insert and the movies re-pointed in one
+    executemany. Copies have no IMDb ID, as that stays with the canonical entry, and their
+    source_id points to the canonical entry. Returns the ids of the entries the movies left.
+    """
+    wanted = {}
+    left = []
+    for movie_id, entry, changes in edits:
+        if all(getattr(entry, name) == value for name, value in changes.items()):
+            continue
+        fields = {name: getattr(entry, name) for name in CATALOG_FIELDS}
+        fields.update(changes, source_id=entry.source_id or entry.id)
+        wanted[movie_id] = fields
+        left.append(entry.id)
+    if not wanted:
+        return left
+
+    def copy_key(fields):
+        return tuple(fields[name] for name in COPY_KEY)
+
+    copies = {}
+    sources = list({fields["source_id"] for fields in wanted.values()})
+    for start in range(0, len(sources), LOOKUP_CHUNK_SIZE):
+        chunk = sources[start:start + LOOKUP_CHUNK_SIZE]
+        for entry in session.scalars(
+            select(CatalogEntry)
+            .where(CatalogEntry.source_id.in_(chunk),
+                   ~exists().where(UserMovie.user_id == user_id, UserMovie.catalog_id == CatalogEntry.id))
+        ):
+            copies.setdefault(copy_key({name: getattr(entry, name) for name in COPY_KEY}), entry.id)
+
+    missing = {}
+    for fields in wanted.values():
+        if copy_key(fields) not in copies:
+            missing.setdefault(copy_key(fields), fields)
+    if missing:
+        new_ids = session.scalars(
+            insert(CatalogEntry).returning(CatalogEntry.id, sort_by_parameter_order=True),
+            list(missing.values()),
+        ).all()
+        copies.update(zip(missing, new_ids))
+
+    session.execute(update(UserMovie), [
+        {"id": movie_id, "catalog_id": copies[copy_key(fields)], "title": fields["title"], "year": fields["year"]}
+        for movie_id, fields in wanted.items()
+    ])
+    return left
+
+
+def prune_catalog_copies(session, catalog_ids):
+    """Deletes those of the given catalog entries that are edited copies nobody owns, so copies don't pile up."""
+    catalog_ids = list(set(catalog_ids))
+    for start in range(0, len(catalog_ids), LOOKUP_CHUNK_SIZE):
+        chunk = catalog_ids[start:start + LOOKUP_CHUNK_SIZE]
+        session.execute(
+            delete(CatalogEntry)
+            .where(CatalogEntry.id.in_(chunk), CatalogEntry.source_id.is_not(None),
+                   ~exists().where(UserMovie.catalog_id == CatalogEntry.id))
+            .execution_options(synchronize_session=False)
+        )
+
+
 class MovieLibrary:
-    """Manages a collection of movies using a SQLAlchemy ORM with a SQLite database."""
-    def __init__(self, db_url):
-        """Initializes the MovieLibrary with a database connection."""
-        self.engine = create_engine(db_url) #Creates a connection engine to database.
-        Base.metadata.create_all(self.engine) #Go through all ORM models and create the tables they define
-        self.Session = sessionmaker(bind=self.engine) #Creates a session factory
+    """Manages a collection of movies using a SQLAlchemy ORM with a SQLite database.
+
+    Film metadata lives in a shared catalog; each user's library holds references to catalog
+    entries with the user's own rating. Every method that takes a username also accepts the
+    user's id; either is checked against the users table once and then cached.
+    """
+    def __init__(self, db_url=DEFAULT_DB_URL):
+        """Initializes the MovieLibrary with the shared engine of the database."""
+        self.engine = get_engine(db_url) #Process-wide engine; the schema is created and migrated once
+        self.Session = get_session_factory(db_url) #Shared session factory
+        self.title_indexes = TitleIndexCache() #Per-user trigram indexes for "did you mean" suggestions
 
-    def add_movie(self, title, year, rating, director=None, cover_art=None, link = None, username=None):
-        """Adds a new movie to the library if it doesn't already exist."""
+    @operation
+    def add_movie(self, title, year, rating, director=None, cover_art=None, link = None, username=None,
+                  imdb_id=None):
+        """Adds a new movie to the library if it doesn't already exist, reusing its catalog entry if there is one."""
         with self.Session() as session:
             if username:
-                user = session.query(User).filter_by(username=username).first()
-                if not user:
+                user_id = resolve_user_id(session, username)
+                if user_id is None:
                     user = User(username=username)
                     session.add(user)
                     session.commit()
-            exists = session.query(Movie).filter_by(title=title, year=year, user_id=user.id).first()
-            if exists:
+                    user_id = user.id
+
+            entry = get_or_create_catalog_entry(session, title, year, director, cover_art, link, imdb_id)
+            movie = None
+            if not self._owned_films(session, user_id, {entry.id: (entry.title, entry.year)}):
+                movie = UserMovie(user_id=user_id, catalog_id=entry.id, rating=rating, title=entry.title, year=entry.year)
+                session.add(movie)
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    movie = None
+            if movie is None:
                 print(f"Movie '{title}' ({year}) already exists in the library for user '{username}'.")
                 return
+            self.title_indexes.add(user_id, movie.id, entry.title)
 
-            movie = Movie(
-                    title=title,
-                    year=year,
-                    rating=rating,
-                    director=director or "Unknown",
-                    cover_art=cover_art or "Missing",
-                    link = link or "Missing",
-                    user_id = user.id
-                )
-            session.add(movie)
+    @operation
+    def get_catalog_entry(self, imdb_id):
+        """Returns the catalog metadata of a film as add_movie keyword arguments, or None if it isn't cataloged.
+
+        The rating is the average rating users gave the film, or None if nobody owns it.
+        """
+        with self.Session() as session:
+            entry = session.scalar(select(CatalogEntry).where(CatalogEntry.imdb_id == imdb_id))
+            if entry is None:
+                return None
+            rating = session.scalar(select(func.avg(UserMovie.rating)).where(UserMovie.catalog_id == entry.id))
+            return {
+                "title": entry.title,
+                "year": entry.year,
+                "rating": round(rating, 1) if rating is not None else None,
+                "director": entry.director,
+                "cover_art": entry.cover_art,
+                "link": entry.link,
+                "imdb_id": entry.imdb_id,
+            }
+
+    def _catalog_ids(self, session, rows):
+        """Maps each (title, year) key of `rows` to its catalog id, adding missing entries in bulk.
+
+        Films are identified by IMDb ID when the row has one, else by title and year.
+        """
+        identities = {key: row["imdb_id"] or key for key, row in rows.items()}
+        imdb_ids = [identity for identity in set(identities.values()) if isinstance(identity, str)]
+        title_years = [identity for identity in set(identities.values()) if isinstance(identity, tuple)]
+
+        found = {}
+        for start in range(0, len(imdb_ids), LOOKUP_CHUNK_SIZE):
+            chunk = imdb_ids[start:start + LOOKUP_CHUNK_SIZE]
+            for catalog_id, imdb_id in session.execute(
+                select(CatalogEntry.id, CatalogEntry.imdb_id).where(CatalogEntry.imdb_id.in_(chunk))
+            ):
+                found[imdb_id] = catalog_id
+
+        for start in range(0, len(title_years), LOOKUP_CHUNK_SIZE):
+            chunk = title_years[start:start + LOOKUP_CHUNK_SIZE]
+            for catalog_id, title, year in session.execute(
+                select(CatalogEntry.id, CatalogEntry.title, CatalogEntry.year)
+                .where(tuple_(CatalogEntry.title, CatalogEntry.year).in_(chunk))
+                .order_by(CatalogEntry.imdb_id.is_(None).desc())  # Entries with an IMDb ID come last and win
+            ):
+                found[(title, year)] = catalog_id
+
+        missing = {}
+        for key, identity in identities.items():
+            if identity not in found and identity not in missing:
+                missing[identity] = {name: value for name, value in rows[key].items() if name != "rating"}
+        if missing:
+            new_ids = session.scalars(
+                insert(CatalogEntry).returning(CatalogEntry.id, sort_by_parameter_order=True),
+                list(missing.values()),
+            ).all()
+            found.update(zip(missing, new_ids))
+
+        return {key: found[identity] for key, identity in identities.items()}
+
+    @staticmethod
+    def _owned_films(session, user_id, films):
+        """Returns the ids among `films`, a {catalog id: (title, year)} dict, of films the user already owns.
+
+        A film is owned when the user has a movie with its title and year, or an edited copy of
+        an entry with its title and year.
+        """
+        copy, source, copied = aliased(CatalogEntry), aliased(CatalogEntry), aliased(CatalogEntry)
+        title_years = list(set(films.values()))
+        owned = set()
+        for start in range(0, len(title_years), LOOKUP_CHUNK_SIZE):
+            chunk = title_years[start:start + LOOKUP_CHUNK_SIZE]
+            owned.update(session.execute(
+                select(UserMovie.title, UserMovie.year)
+                .where(UserMovie.user_id == user_id, tuple_(UserMovie.title, UserMovie.year).in_(chunk))
+            ).tuples())
+            # Copies are found from the catalog side, through the sources' title and year
+            owned.update(session.execute(
+                select(source.title, source.year)
+                .select_from(UserMovie)
+                .join(copy, copy.id == UserMovie.catalog_id)
+                .join(source, source.id == copy.source_id)
+                .where(UserMovie.user_id == user_id, UserMovie.catalog_id.in_(
+                    select(CatalogEntry.id)
+                    .join(copied, copied.id == CatalogEntry.source_id)
+                    .where(tuple_(copied.title, copied.year).in_(chunk))
+                ))
+            ).tuples())
+        return {catalog_id for catalog_id, film in films.items() if film in owned}
+
+    @operation
+    def add_movies(self, username, movies):
+        """Adds many movies in a single transaction, skipping ones that already exist.
+
+        Each movie is a dict with the add_movie keyword arguments. Catalog entries that already
+        exist are reused and missing ones added. Returns a tuple of (inserted, skipped) counts.
+        """
+        rows = {}
+        skipped = 0
+        for movie in movies:
+            key = (movie["title"], int(movie["year"]))
+            if key in rows:
+                skipped += 1
+                continue
+            rows[key] = {
+                "imdb_id": movie.get("imdb_id") or imdb_id_from_link(movie.get("link")),
+                "title": key[0],
+                "year": key[1],
+                "rating": movie["rating"],
+                "director": movie.get("director") or "Unknown",
+                "cover_art": movie.get("cover_art") or "Missing",
+                "link": movie.get("link") or "Missing",
+            }
+
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            catalog_ids = self._catalog_ids(session, rows)
+
+            # Titles and years of the resolved entries, which may differ from the input for IMDb matches
+            films = {}
+            wanted = list(set(catalog_ids.values()))
+            for start in range(0, len(wanted), LOOKUP_CHUNK_SIZE):
+                chunk = wanted[start:start + LOOKUP_CHUNK_SIZE]
+                for catalog_id, title, year in session.execute(
+                    select(CatalogEntry.id, CatalogEntry.title, CatalogEntry.year).where(CatalogEntry.id.in_(chunk))
+                ):
+                    films[catalog_id] = (title, year)
+            owned = self._owned_films(session, user_id, films)
+
+            new_rows = []
+            added = set()
+            for key, row in rows.items():
+                catalog_id = catalog_ids[key]
+                title, year = films[catalog_id]
+                if catalog_id in owned or (title, year) in added:
+                    skipped += 1  # Already in the library, or two entries resolved to the same film
+                    continue
+                added.add((title, year))
+                new_rows.append({"user_id": user_id, "catalog_id": catalog_id, "rating": row["rating"],
+                                 "title": title, "year": year})
+            if new_rows:
+                session.execute(insert(UserMovie), new_rows)
             session.commit()
+            self.title_indexes.invalidate(user_id)
+
+        return len(new_rows), skipped
+
+    def _find_user_movie(self, session, user_id, title):
+        """Returns the user's movie with the given title, or None."""
+        return session.scalars(select_user_movies(user_id).where(UserMovie.title == title).limit(1)).first()
+
+    @staticmethod
+    def _apply_update(session, movie, changes):
+        """Applies updates to a user's movie; metadata edits re-point it to a copy of its catalog entry."""
+        if "rating" in changes:
+            movie.rating = changes["rating"]
+        metadata = {name: changes[name] for name in CATALOG_UPDATABLE_COLUMNS if name in changes}
+        if metadata:
+            session.flush()
+            prune_catalog_copies(session, fork_catalog_entries(session, movie.user_id, [(movie.id, movie.catalog, metadata)]))
+            session.expire(movie)
+
+    @operation
+    def apply_writes(self, username, operations):
+        """Applies a sequence of add, update and remove operations to the user's library in one transaction.
 
+        Each operation is a dict with an "op" key ("add", "update" or "remove") and the arguments
+        of the matching single-movie method. Returns one outcome per operation: "added", "exists",
+        "updated", "removed" or "not found". Nothing is written if any operation raises.
+        """
+        for op in operations:
+            if op.get("op") not in WRITE_OPERATIONS:
+                raise ValueError(f"Unknown write operation '{op.get('op')}'")
+
+        outcomes = []
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            removed = []
+            for op in operations:
+                if op["op"] == "add":
+                    entry = get_or_create_catalog_entry(
+                        session, op["title"], op["year"], op.get("director"), op.get("cover_art"),
+                        op.get("link"), op.get("imdb_id"),
+                    )
+                    if self._owned_films(session, user_id, {entry.id: (entry.title, entry.year)}):
+                        outcomes.append("exists")
+                        continue
+                    session.add(UserMovie(user_id=user_id, catalog_id=entry.id, rating=op["rating"],
+                                          title=entry.title, year=entry.year))
+                    outcomes.append("added")
+                    continue
+
+                movie = self._find_user_movie(session, user_id, op["title"])
+                if movie is None:
+                    outcomes.append("not found")
+                elif op["op"] == "update":
+                    self._apply_update(session, movie, op)
+                    outcomes.append("updated")
+                else:
+                    removed.append(movie.catalog_id)
+                    session.delete(movie)
+                    outcomes.append("removed")
+            prune_catalog_copies(session, removed)
+            session.commit()
+            self.title_indexes.invalidate(user_id)
+        return outcomes
+
+    @operation
     def update_movie(self, title, username, **kwargs):
-        """Updates details of an existing movie by title."""
+        """Updates details of an existing movie by title.
+
+        Edits to year, director or cover art apply to this user's copy only (see fork_catalog_entries).
+        """
         with self.Session() as session:
-            user = session.query(User).filter_by(username=username).first()
-            movie = session.query(Movie).filter_by(title=title, user_id=user.id).first()
+            user_id = require_user_id(session, username)
+            movie = self._find_user_movie(session, user_id, title)
             if movie:
-                if 'year' in kwargs:
-                    movie.year = kwargs['year']
-                if 'rating' in kwargs:
-                    movie.rating = kwargs['rating']
-                if 'director' in kwargs:
-                    movie.director = kwargs['director']
-                if 'cover_art' in kwargs:
-                    movie.cover_art = kwargs['cover_art']
-                session.commit()
+                try:
+                    self._apply_update(session, movie, kwargs)
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    print(f"Movie '{title}' ({kwargs.get('year')}) already exists in the library.")
             else:
                 print(f"No movie found with title '{title}'")
 
 
+    @operation
     def remove_movie(self, title, username):
-        """Removes a movie from the library by title."""
+        """Removes a movie from the library by title; shared catalog entries are kept for reuse."""
         with self.Session() as session:
-            user = session.query(User).filter_by(username=username).first()
-            movie = session.query(Movie).filter_by(title=title, user_id=user.id).first()
+            user_id = require_user_id(session, username)
+            movie = self._find_user_movie(session, user_id, title)
             if movie:
                 session.delete(movie)
+                prune_catalog_copies(session, [movie.catalog_id])
                 session.commit()
+                self.title_indexes.remove(user_id, movie.id)
                 print(f"Movie '{title}' removed from the library.")
             else:
                 print(f"No movie found with title '{title}'")
 
+    @operation
+    def update_movies(self, username, changes):
+        """Applies per-title updates to the user's library in one transaction.
+
+        `changes` maps titles to dicts of new values, e.g. {"Alien": {"rating": 9}}; every movie of
+        the user with that title is updated. Rating changes sharing the same titles are sent as
+        one executemany batch. Year, director and cover art edits apply to the user's copy only,
+        and those movies are re-pointed in one batch (see fork_catalog_entries). Returns the number of
+        the user's movies updated.
+        """
+        ratings = []
+        metadata = {}
+        for title, fields in changes.items():
+            unknown = set(fields) - set(UPDATABLE_COLUMNS)
+            if unknown:
+                raise ValueError(f"Cannot update movie columns: {', '.join(sorted(unknown))}")
+            if "rating" in fields:
+                ratings.append({"b_title": title, "rating": fields["rating"]})
+            edits = {name: value for name, value in fields.items() if name != "rating"}
+            if edits:
+                metadata[title] = edits
+
+        updated = set()
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            if ratings:
+                # Ids first, so rows updated both ways are counted once
+                for start in range(0, len(ratings), LOOKUP_CHUNK_SIZE):
+                    chunk = [params["b_title"] for params in ratings[start:start + LOOKUP_CHUNK_SIZE]]
+                    updated.update(session.scalars(
+                        select(UserMovie.id).where(UserMovie.user_id == user_id, UserMovie.title.in_(chunk))
+                    ))
+                session.connection().execute(
+                    update(UserMovie)
+                    .where(UserMovie.user_id == user_id, UserMovie.title == bindparam("b_title"))
+                    .values(rating=bindparam("rating")),
+                    ratings,
+                )
+
+            edits = []
+            titles = list(metadata)
+            for start in range(0, len(titles), LOOKUP_CHUNK_SIZE):
+                chunk = titles[start:start + LOOKUP_CHUNK_SIZE]
+                for movie_id, entry in session.execute(
+                    select(UserMovie.id, CatalogEntry)
+                    .join(UserMovie.catalog)
+                    .where(UserMovie.user_id == user_id, UserMovie.title.in_(chunk))
+                ):
+                    edits.append((movie_id, entry, metadata[entry.title]))
+                    updated.add(movie_id)
+            prune_catalog_copies(session, fork_catalog_entries(session, user_id, edits))
+            session.commit()
+        return len(updated)
+
+    @operation
+    def remove_movies(self, username, titles=None, rating_below=None, year_before=None):
+        """Removes the user's movies matching every given criterion in one transaction.
+
+        Criteria are a list of titles, a rating strictly below rating_below and a release year
+        strictly before year_before; at least one is required. Each criterion compiles into the
+        WHERE clause of a single DELETE (title lists are sent in chunks). Shared catalog entries
+        are kept for reuse, edited copies nobody owns are deleted. Returns the number of movies removed.
+        """
+        if titles is None and rating_below is None and year_before is None:
+            raise ValueError("remove_movies needs titles, rating_below or year_before")
+
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            statement = delete(UserMovie).where(UserMovie.user_id == user_id)
+            if rating_below is not None:
+                statement = statement.where(UserMovie.rating < rating_below)
+            if year_before is not None:
+                statement = statement.where(UserMovie.year < year_before)
+
+            connection = session.connection()
+            statement = statement.returning(UserMovie.catalog_id)
+            if titles is None:
+                left = connection.execute(statement).scalars().all()
+            else:
+                titles = list(titles)
+                left = []
+                for start in range(0, len(titles), LOOKUP_CHUNK_SIZE):
+                    chunk = titles[start:start + LOOKUP_CHUNK_SIZE]
+                    left += connection.execute(statement.where(UserMovie.title.in_(chunk))).scalars().all()
+            removed = len(left)
+            prune_catalog_copies(session, left)
+            session.commit()
+            self.title_indexes.invalidate(user_id)
+        return removed
+
+    @operation
+    def random_movie(self, username, min_rating=None, k=1):
+        """Returns up to k distinct random movies of the user as dicts, in random order.
+
+        Picks are drawn as random offsets into the (user_id, rating) index, so only the chosen
+        rows are loaded; the unfiltered count comes from the stored stats.
+        """
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            query = select(UserMovie.id).where(UserMovie.user_id == user_id)
+            if min_rating is None:
+                stats = session.get(UserStats, user_id)
+                count = stats.movie_count if stats else 0
+            else:
+                query = query.where(UserMovie.rating >= min_rating)
+                count = session.scalar(select(func.count()).select_from(query.subquery()))
+
+            query = query.order_by(UserMovie.rating, UserMovie.id)  # Index order, no sort step
+            ids = [session.scalar(query.offset(offset).limit(1))
+                   for offset in random.sample(range(count), min(k, count))]
+            movies = {movie.id: movie for movie in session.scalars(select_user_movies(user_id).where(UserMovie.id.in_(ids)))}
+            return [movie_to_dict(movies[movie_id]) for movie_id in ids if movie_id in movies]
+
+    @operation
     def get_movies_as_movie_obj(self, username):
-        """Returns a list of all movies in the library."""
+        """Yields the user's movies as UserMovie objects while their session is still open."""
         with self.Session() as session:
-            user = session.query(User).filter_by(username=username).first()
-            movies = session.query(Movie).filter_by(user_id=user.id).all()
+            user_id = require_user_id(session, username)
+            yield from session.scalars(
+                select_user_movies(user_id).execution_options(yield_per=DEFAULT_BATCH_SIZE)
+            )
+
+    @operation
+    def iter_movies(self, username, columns=("title", "year", "rating"), batch_size=DEFAULT_BATCH_SIZE):
+        """Yields the user's movies as lightweight rows holding only the requested columns.
+
+        Rows are streamed from the database batch_size at a time and support attribute access,
+        e.g. row.title, so the library is never materialized as a whole.
+        """
+        unknown = set(columns) - set(MOVIE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown movie columns: {', '.join(sorted(unknown))}")
 
-        return movies
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            result = session.execute(
+                select(*(MOVIE_COLUMNS[name].label(name) for name in columns))
+                .select_from(UserMovie)
+                .join(CatalogEntry, CatalogEntry.id == UserMovie.catalog_id)
+                .where(UserMovie.user_id == user_id)
+                .order_by(UserMovie.id)
+                .execution_options(yield_per=batch_size)
+            )
+            yield from result
 
+    @operation
     def get_movies_as_dict(self, username):
         """Returns all movies in the library as a list of dictionaries."""
         with self.Session() as session:
-            user = session.query(User).filter_by(username=username).first()
-            movies = session.query(Movie).filter_by(user_id=user.id).all()
-        output = []
-        for movie in movies:
-            output.append({
-                "title": movie.title,
-                "year": movie.year,
-                "rating": movie.rating,
-                "director": movie.director,
-                "cover_art": movie.cover_art,
-                "link": movie.link
-            })
-        return output
+            user_id = require_user_id(session, username)
+            movies = session.scalars(select_user_movies(user_id).order_by(UserMovie.id)).all()
+            return [movie_to_dict(movie) for movie in movies]
+
+    @operation
+    def count_movies(self, username):
+        """Returns the number of movies in the user's library, read from its stored stats."""
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            stats = session.get(UserStats, user_id)
+            return stats.movie_count if stats else 0
+
+    @operation
+    def query_movies(self, username, min_rating=None, year_range=None, order_by="title", limit=50, after=None):
+        """Returns one page of the user's movies, filtered and ordered in SQL.
+
+        year_range is a (start, end) tuple where either end may be None. order_by is one of
+        "title", "year" or "rating" (highest first). Pages are keyset-paginated: pass the cursor
+        returned with a page as `after` to fetch the next one. Returns a tuple of
+        (movies as dicts, next cursor), where the cursor is None on the last page.
+        """
+        if order_by not in ORDERINGS:
+            raise ValueError(f"Cannot order movies by '{order_by}'")
+        column_name, descending = ORDERINGS[order_by]
+        sort_column = MOVIE_COLUMNS[column_name]
+
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            query = select_user_movies(user_id)
+
+            if min_rating is not None:
+                query = query.where(UserMovie.rating >= min_rating)
+            if year_range is not None:
+                start_year, end_year = year_range
+                if start_year is not None:
+                    query = query.where(UserMovie.year >= start_year)
+                if end_year is not None:
+                    query = query.where(UserMovie.year <= end_year)
+
+            if after is not None:
+                position = tuple_(sort_column, UserMovie.id)
+                query = query.where(position < tuple_(*after) if descending else position > tuple_(*after))
+
+            if descending:
+                query = query.order_by(sort_column.desc(), UserMovie.id.desc())
+            else:
+                query = query.order_by(sort_column, UserMovie.id)
+
+            movies = session.scalars(query.limit(limit + 1)).all()
+            has_more = len(movies) > limit
+            movies = movies[:limit]
+
+            cursor = None
+            if has_more:
+                last = movies[-1]
+                cursor = (getattr(last, column_name), last.id)
+
+            return [movie_to_dict(movie) for movie in movies], cursor
+
+    @operation
+    def search(self, username, query, limit=10):
+        """Returns the user's movies whose title or director match every word of the query.
+
+        Each word is matched as a prefix through the FTS5 index and results are ranked by bm25,
+        best match first.
+        """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"*' for word in words)
+
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            movies = session.scalars(
+                select_user_movies(user_id)
+                .join(catalog_fts, catalog_fts.c.rowid == CatalogEntry.id)
+                .where(literal_column("catalog_fts").op("MATCH")(match))
+                .order_by(func.bm25(literal_column("catalog_fts")))
+                .limit(limit)
+            ).all()
+            return [movie_to_dict(movie) for movie in movies]
+
+    @operation
+    def suggest(self, username, query, limit=3):
+        """Returns the user's movies whose titles are closest to the query, best match first.
+
+        Candidates come from the user's in-memory trigram index and are rescored by edit distance.
+        """
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            index = self.title_indexes.get(
+                user_id, lambda: session.execute(
+                    select(UserMovie.id, UserMovie.title).where(UserMovie.user_id == user_id)
+                )
+            )
+            ids = [movie_id for movie_id, _, _ in index.suggest(query, limit)]
+            movies = {movie.id: movie for movie in session.scalars(select_user_movies(user_id).where(UserMovie.id.in_(ids)))}
+            return [movie_to_dict(movies[movie_id]) for movie_id in ids if movie_id in movies]
+
+    @staticmethod
+    def _rating_bucket(bins):
+        """Returns a SQL expression mapping a rating to its histogram bin; 10 falls into the last bin."""
+        return case(
+            (UserMovie.rating >= MAX_RATING, bins - 1),
+            else_=cast(UserMovie.rating * bins / MAX_RATING, Integer),
+        )
+
+    @operation
+    def get_rating_histogram(self, username, bins=10):
+        """Returns the number of the user's movies in each of `bins` equal-width rating bins.
+
+        Bin counts dividing STATS_BUCKETS are read from the stored stats; others are counted in SQL.
+        """
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            if STATS_BUCKETS % bins == 0:
+                stats = session.get(UserStats, user_id)
+                return stats.histogram(bins) if stats else [0] * bins
+
+            bucket = self._rating_bucket(bins)
+            counts = [0] * bins
+            for index, count in session.execute(
+                select(bucket, func.count()).where(UserMovie.user_id == user_id).group_by(bucket)
+            ):
+                counts[index] = count
+        return counts
+
+    @operation
+    def get_rating_histograms(self, bins=10):
+        """Returns the rating histogram of every user with movies as a {username: counts} dict."""
+        histograms = {}
+        with self.Session() as session:
+            if STATS_BUCKETS % bins == 0:
+                for username, stats in session.execute(
+                    select(User.username, UserStats)
+                    .join(UserStats, UserStats.user_id == User.id)
+                    .where(UserStats.movie_count > 0)
+                ):
+                    histograms[username] = stats.histogram(bins)
+                return histograms
+
+            bucket = self._rating_bucket(bins)
+            for username, index, count in session.execute(
+                select(User.username, bucket, func.count())
+                .join(UserMovie, UserMovie.user_id == User.id)
+                .group_by(User.username, bucket)
+            ):
+                histograms.setdefault(username, [0] * bins)[index] = count
+        return histograms
+
+    @operation
+    def get_rating_stats(self, username):
+        """Returns rating statistics for the user's library, or None if it is empty.
+
+        The result holds count, average, median, min and max ratings plus the titles of the
+        best- and worst-rated movies. Count, average and extremes come from the stored stats;
+        the median and titles are index lookups.
+        """
+        with self.Session() as session:
+            user_id = require_user_id(session, username)
+            stats = session.get(UserStats, user_id)
+            if not stats or not stats.movie_count:
+                return None
+            count = stats.movie_count
+
+            middle = session.scalars(
+                select(UserMovie.rating)
+                .where(UserMovie.user_id == user_id)
+                .order_by(UserMovie.rating)
+                .offset((count - 1) // 2)
+                .limit(2 - count % 2)
+            ).all()
+            median = sum(middle) / len(middle)
+
+            def titles_rated(rating):
+                return session.scalars(
+                    select(UserMovie.title)
+                    .where(UserMovie.user_id == user_id, UserMovie.rating == rating)
+                    .order_by(UserMovie.title)
+                ).all()
+
+            return {
+                "count": count,
+                "average": stats.rating_sum / count,
+                "median": median,
+                "min": stats.min_rating,
+                "max": stats.max_rating,
+                "best": titles_rated(stats.max_rating),
+                "worst": titles_rated(stats.min_rating),
+            }
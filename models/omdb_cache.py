@@ -0,0 +1,114 @@
+import json
+import time
+
+from sqlalchemy import Column, Integer, String, Float, Text, delete, select, func
+
+from models.base import Base
+from models.engine import DEFAULT_DB_URL, get_engine, get_session_factory
+
+
+DEFAULT_TTL = 7 * 24 * 60 * 60  # One week for successful lookups
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60  # One day for "Response: False" results
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class CachedResponse(Base):
+    """Represents a cached OMDb API response."""
+    __tablename__ = "omdb_cache"
+
+    key = Column(String, primary_key=True)
+    payload = Column(Text, nullable=False)
+    negative = Column(Integer, nullable=False, default=0)
+    expires_at = Column(Float, nullable=False)
+    last_accessed = Column(Float, nullable=False, index=True)
+
+
+class OmdbCache:
+    """Persists OMDb responses in SQLite with per-entry TTL and LRU eviction."""
+    def __init__(self, db_url=DEFAULT_DB_URL, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        """Initializes the cache with a database connection and eviction policy."""
+        self.engine = get_engine(db_url)
+        self.Session = get_session_factory(db_url)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(params):
+        """Builds a normalized cache key from OMDb query parameters (API key excluded)."""
+        normalized = {
+            str(key).lower(): " ".join(str(value).split()).lower()
+            for key, value in params.items()
+            if key != "apikey" and value is not None
+        }
+        return "&".join(f"{key}={normalized[key]}" for key in sorted(normalized))
+
+    def get(self, params):
+        """Returns the cached response for the given parameters, or None on a miss."""
+        key = self.make_key(params)
+        now = time.time()
+        with self.Session() as session:
+            entry = session.get(CachedResponse, key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    session.delete(entry)
+                    session.commit()
+                self.misses += 1
+                return None
+            entry.last_accessed = now
+            payload = entry.payload
+            session.commit()
+        self.hits += 1
+        return json.loads(payload)
+
+    def put(self, params, data, ttl=None):
+        """Stores a response, using the negative TTL for "Response: False" results."""
+        negative = data.get("Response") == "False"
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        now = time.time()
+        with self.Session() as session:
+            session.merge(CachedResponse(
+                key=self.make_key(params),
+                payload=json.dumps(data),
+                negative=int(negative),
+                expires_at=now + ttl,
+                last_accessed=now,
+            ))
+            session.flush()
+            self._evict(session)
+            session.commit()
+
+    def _evict(self, session):
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        session.execute(delete(CachedResponse).where(CachedResponse.expires_at <= time.time()))
+        overflow = session.scalar(select(func.count()).select_from(CachedResponse)) - self.max_entries
+        if overflow > 0:
+            oldest = (select(CachedResponse.key)
+                      .order_by(CachedResponse.last_accessed)
+                      .limit(overflow)
+                      .scalar_subquery())
+            session.execute(delete(CachedResponse).where(CachedResponse.key.in_(oldest)))
+
+    def clear(self):
+        """Removes every cached response and resets the counters."""
+        with self.Session() as session:
+            session.execute(delete(CachedResponse))
+            session.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Returns hit/miss counters and the number of stored entries."""
+        with self.Session() as session:
+            size = session.scalar(select(func.count()).select_from(CachedResponse))
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size,
+        }
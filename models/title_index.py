@@ -0,0 +1,113 @@
+from collections import Counter, OrderedDict, defaultdict
+
+
+DEFAULT_SHORTLIST_SIZE = 50
+DEFAULT_MAX_USERS = 32
+
+
+def trigrams(text):
+    """Returns the set of character trigrams of a lowercased, space-padded string."""
+    padded = f"  {' '.join(text.lower().split())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """Returns the Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a, b):
+    """Returns a 0-100 similarity score derived from the edit distance of two strings."""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 100
+    return round(100 * (1 - edit_distance(a, b) / longest))
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to the titles of one user's movies."""
+    def __init__(self, titles=()):
+        """Builds the index from an iterable of (movie_id, title) pairs."""
+        self.titles = {}
+        self.postings = defaultdict(set)
+        for movie_id, title in titles:
+            self.add(movie_id, title)
+
+    def add(self, movie_id, title):
+        """Adds or replaces the title of a movie."""
+        self.remove(movie_id)
+        self.titles[movie_id] = title
+        for gram in trigrams(title):
+            self.postings[gram].add(movie_id)
+
+    def remove(self, movie_id):
+        """Removes a movie from the index if present."""
+        title = self.titles.pop(movie_id, None)
+        if title is None:
+            return
+        for gram in trigrams(title):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(movie_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def suggest(self, query, limit=3, shortlist_size=DEFAULT_SHORTLIST_SIZE):
+        """Returns up to `limit` (movie_id, title, score) tuples for the titles closest to the query.
+
+        Candidates sharing the most trigrams with the query are shortlisted first; only the
+        shortlist is rescored by edit distance.
+        """
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        shortlist = [movie_id for movie_id, _ in shared.most_common(shortlist_size)]
+        query = query.lower()
+        scored = [(movie_id, self.titles[movie_id], similarity(query, self.titles[movie_id].lower()))
+                  for movie_id in shortlist]
+        scored.sort(key=lambda item: item[2], reverse=True)
+        return scored[:limit]
+
+
+class TitleIndexCache:
+    """Keeps the trigram indexes of the most recently used users in memory."""
+    def __init__(self, max_users=DEFAULT_MAX_USERS):
+        """Initializes an empty cache holding at most max_users indexes."""
+        self.max_users = max_users
+        self.indexes = OrderedDict()
+
+    def get(self, user_id, load_titles):
+        """Returns the user's index, building it from load_titles() on a miss."""
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = TrigramIndex(load_titles())
+            self.indexes[user_id] = index
+            if len(self.indexes) > self.max_users:
+                self.indexes.popitem(last=False)
+        else:
+            self.indexes.move_to_end(user_id)
+        return index
+
+    def add(self, user_id, movie_id, title):
+        """Adds a title to the user's index if it is cached."""
+        if user_id in self.indexes:
+            self.indexes[user_id].add(movie_id, title)
+
+    def remove(self, user_id, movie_id):
+        """Removes a movie from the user's index if it is cached."""
+        if user_id in self.indexes:
+            self.indexes[user_id].remove(movie_id)
+
+    def invalidate(self, user_id):
+        """Drops the user's index so it is rebuilt on next use."""
+        self.indexes.pop(user_id, None)
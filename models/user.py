@@ -1,8 +1,75 @@
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy import Column, Integer, String, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, relationship
+from collections import OrderedDict
 import hashlib
+import threading
 
 from models.base import Base
+from models.engine import DEFAULT_DB_URL, get_engine, get_session_factory
+from models.instrumentation import operation
+from models.user_stats import UserStats
+
+DEFAULT_USER_CACHE_SIZE = 1024
+
+
+class UserIdCache:
+    """Bounded LRU cache mapping (database URL, username or checked id) to user ids."""
+    def __init__(self, maxsize=DEFAULT_USER_CACHE_SIZE):
+        """Initializes an empty cache holding at most maxsize usernames."""
+        self.maxsize = maxsize
+        self.ids = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached user id for a key, or None."""
+        with self.lock:
+            user_id = self.ids.get(key)
+            if user_id is not None:
+                self.ids.move_to_end(key)
+            return user_id
+
+    def put(self, key, user_id):
+        """Caches a user id, evicting the least recently used entry when full."""
+        with self.lock:
+            self.ids[key] = user_id
+            self.ids.move_to_end(key)
+            if len(self.ids) > self.maxsize:
+                self.ids.popitem(last=False)
+
+    def invalidate(self, key):
+        """Forgets a cached user id."""
+        with self.lock:
+            self.ids.pop(key, None)
+
+
+user_ids = UserIdCache()
+
+
+def user_cache_key(session, user):
+    """Returns the user id cache key of a username, or of an id being checked, in the session's database."""
+    return str(session.get_bind().url), user
+
+
+def resolve_user_id(session, user):
+    """Returns the id of a user given either its id or its username, or None if there is no such user."""
+    key = user_cache_key(session, user)
+    user_id = user_ids.get(key)
+    if user_id is None:
+        column = User.id if isinstance(user, int) else User.username
+        user_id = session.scalar(select(User.id).where(column == user))
+        if user_id is not None:
+            user_ids.put(key, user_id)
+    return user_id
+
+
+def require_user_id(session, user):
+    """Like resolve_user_id, but raises ValueError if there is no such user."""
+    user_id = resolve_user_id(session, user)
+    if user_id is None:
+        raise ValueError("User not found")
+    return user_id
+
 
 class User(Base):
     """Represents a user in the database."""
@@ -12,7 +79,7 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
 
-    movies = relationship("Movie", back_populates="user")
+    movies = relationship("UserMovie", back_populates="user", cascade="all, delete-orphan")
 
     @staticmethod
     def hash_password(password):
@@ -28,32 +95,39 @@ class User(Base):
 
 class UserHandler:
     """Manages a collection of users using a SQLAlchemy ORM with a SQLite database."""
-    def __init__(self, db_url):
-        """Initializes the MovieLibrary with a database connection."""
-        self.engine = create_engine(db_url)  # Creates a connection engine to database.
-        Base.metadata.create_all(self.engine)  # Go through all ORM models and create the tables they define
-        self.Session = sessionmaker(bind=self.engine)  # Creates a session factory
+    def __init__(self, db_url=DEFAULT_DB_URL):
+        """Initializes the UserHandler with the shared engine of the database."""
+        self.engine = get_engine(db_url)  # Process-wide engine; the schema is created and migrated once
+        self.Session = get_session_factory(db_url)  # Shared session factory
 
+    @operation
     def create_user(self, username, password):
         """Creates a new user if it doesn't already exist."""
         with self.Session() as session:
-            if self.get_user_by_username(username):
-                print("Username already exists")
-                return None
-
             new_user = User(
                 username=username,
                 password_hash=User.hash_password(password)
             )
             session.add(new_user)
-            session.commit()
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                print("Username already exists")
+                return None
+            user_ids.put(user_cache_key(session, username), new_user.id)
             return new_user
 
+    @operation
     def get_user_by_username(self, username):
         """Returns a user with the given username, or None if not found."""
         with self.Session() as session:
-            return session.query(User).filter_by(username=username).first()
+            user = session.query(User).filter_by(username=username).first()
+            if user:
+                user_ids.put(user_cache_key(session, username), user.id)
+            return user
 
+    @operation
     def verify_user(self, username, password):
         """Verifies that the given username and password are correct."""
         user = self.get_user_by_username(username)
@@ -61,19 +135,30 @@ class UserHandler:
             return True
         return False
 
+    @operation
     def list_users(self):
         """Returns a list of all users in the database."""
         with self.Session() as session:
             return session.query(User).all()
 
+    @operation
     def delete_user(self, username):
-        """Deletes a user from the database."""
-        user = self.get_user_by_username(username)
-        if not user:
-            raise ValueError("User not found")
+        """Deletes a user from the database along with their movies, rating stats and edited copies."""
         with self.Session() as session:
+            user = session.query(User).filter_by(username=username).first()
+            if not user:
+                raise ValueError("User not found")
+            from models.movie import prune_catalog_copies  # models.movie imports this module
+
+            user_id = user.id
+            catalog_ids = [movie.catalog_id for movie in user.movies]
             session.delete(user)
+            session.flush()  # Deleting the movies runs the stats triggers, so the stats row goes last
+            session.execute(delete(UserStats).where(UserStats.user_id == user_id))
+            prune_catalog_copies(session, catalog_ids)
             session.commit()
+            user_ids.invalidate(user_cache_key(session, username))
+            user_ids.invalidate(user_cache_key(session, user_id))
 
     def __str__(self):
         users = self.list_users()
@@ -81,7 +166,7 @@ class UserHandler:
 
 
 if __name__ == "__main__":
-    user_handler = UserHandler("sqlite:///movies.db")
+    user_handler = UserHandler()
     user_handler.create_user("admin", "admin")
     user_handler.create_user("user", "user")
     print(user_handler)
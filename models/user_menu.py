@@ -1,13 +1,20 @@
 import sys
-from models.user import UserHandler
 
-# Initialize the MovieLibrary
-user_handler = UserHandler("sqlite:///movies.db")
+_user_handler = None
+
+
+def get_user_handler():
+    """Returns the UserHandler, opening the database on first use."""
+    global _user_handler
+    if _user_handler is None:
+        from models.user import UserHandler
+        _user_handler = UserHandler()
+    return _user_handler
 
 
 def print_all_users():
     """Prints all users in the database."""
-    print(user_handler)
+    print(get_user_handler())
 
 def login():
     """Logs in a user."""
@@ -15,7 +22,7 @@ def login():
     username = input("Enter username: ")
     password = input("Enter password: ")
 
-    if user_handler.verify_user(username,password):
+    if get_user_handler().verify_user(username,password):
         return username
     else:
         print("Incorrect username or password.")
@@ -26,7 +33,7 @@ def register():
     print("Registering new user:")
     username = input("Enter username: ")
     password = input("Enter password: ")
-    user_handler.create_user(username,password)
+    get_user_handler().create_user(username,password)
 
 
 def exit_program():
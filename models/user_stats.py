@@ -0,0 +1,77 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+
+from models.base import Base
+
+
+# Ratings are on a 0-10 scale; the stored histogram splits that range into equal-width buckets
+MAX_RATING = 10
+STATS_BUCKETS = 10
+BUCKET_COLUMNS = [f"bucket_{index}" for index in range(STATS_BUCKETS)]
+STATS_COLUMNS = ["user_id", "movie_count", "rating_sum", "min_rating", "max_rating"] + BUCKET_COLUMNS
+
+
+class UserStats(Base):
+    """Rating summary of one user's library, kept up to date by triggers on user_movies."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    movie_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0)
+    min_rating = Column(Float)
+    max_rating = Column(Float)
+    bucket_0 = Column(Integer, nullable=False, default=0)
+    bucket_1 = Column(Integer, nullable=False, default=0)
+    bucket_2 = Column(Integer, nullable=False, default=0)
+    bucket_3 = Column(Integer, nullable=False, default=0)
+    bucket_4 = Column(Integer, nullable=False, default=0)
+    bucket_5 = Column(Integer, nullable=False, default=0)
+    bucket_6 = Column(Integer, nullable=False, default=0)
+    bucket_7 = Column(Integer, nullable=False, default=0)
+    bucket_8 = Column(Integer, nullable=False, default=0)
+    bucket_9 = Column(Integer, nullable=False, default=0)
+
+    def histogram(self, bins=STATS_BUCKETS):
+        """Returns the rating histogram in `bins` bins, which must divide STATS_BUCKETS."""
+        counts = [getattr(self, name) for name in BUCKET_COLUMNS]
+        width = STATS_BUCKETS // bins
+        return [sum(counts[start:start + width]) for start in range(0, STATS_BUCKETS, width)]
+
+
+def bucket_sql(rating):
+    """Returns the SQL expression of the stored histogram bucket of a rating; 10 falls into the last one."""
+    return (f"CASE WHEN {rating} >= {MAX_RATING} THEN {STATS_BUCKETS - 1} "
+            f"ELSE CAST({rating} * {STATS_BUCKETS} / {MAX_RATING} AS INTEGER) END")
+
+
+# Recomputes every user's summary from user_movies, in STATS_COLUMNS order
+AGGREGATE_SQL = (
+    "SELECT user_id, COUNT(*), SUM(rating), MIN(rating), MAX(rating), "
+    + ", ".join(f"SUM(({bucket_sql('rating')}) = {index})" for index in range(STATS_BUCKETS))
+    + " FROM user_movies GROUP BY user_id"
+)
+
+
+def rebuild(connection):
+    """Replaces the stored summaries with ones recomputed from user_movies; returns the number of users."""
+    connection.exec_driver_sql("DELETE FROM user_stats")
+    connection.exec_driver_sql(f"INSERT INTO user_stats ({', '.join(STATS_COLUMNS)}) {AGGREGATE_SQL}")
+    return connection.exec_driver_sql("SELECT COUNT(*) FROM user_stats").scalar()
+
+
+def verify(connection):
+    """Returns the ids of users whose stored summary differs from one recomputed from user_movies."""
+    expected = {row[0]: row for row in connection.exec_driver_sql(AGGREGATE_SQL)}
+    stored = {row[0]: row for row in connection.exec_driver_sql(
+        f"SELECT {', '.join(STATS_COLUMNS)} FROM user_stats WHERE movie_count > 0"
+    )}
+
+    drifted = []
+    for user_id in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(user_id), stored.get(user_id)
+        if want is None or have is None:
+            drifted.append(user_id)
+        elif (want[1] != have[1] or abs(want[2] - have[2]) > 1e-6 or want[3:5] != have[3:5]
+              or want[5:] != have[5:]):
+            drifted.append(user_id)
+    return drifted
+
@@ -1,57 +1,87 @@
 # Standard library import
-import statistics
-import random
+import os
 
+# Dependency-free, so importing it does not slow down startup
+from models import instrumentation
 
-# Third-party imports
-import matplotlib.pyplot as plt
-from fuzzywuzzy import process
+# Third-party and local modules (matplotlib, requests, SQLAlchemy) are imported
+# on first use so the menu starts without loading them.
 
 
-# Local module import
-from models.movie import MovieLibrary
-import generate_website
-from api_connection import search_movies_api
+_library = None
 
+# Number of movies fetched per query when streaming listings
+PAGE_SIZE = 100
 
-# Initialize the MovieLibrary
-library = MovieLibrary("sqlite:///movies.db")
+# Maximum number of results shown by a search
+SEARCH_LIMIT = 50
+
+
+def get_library():
+    """Returns the MovieLibrary, opening the database on first use.
+
+    Setting MOVIE_LIBRARY_CACHE=1 serves whole-library reads from an in-memory cache.
+    """
+    global _library
+    if _library is None:
+        from models.movie import MovieLibrary
+        _library = MovieLibrary()
+        if os.getenv("MOVIE_LIBRARY_CACHE", "") not in ("", "0"):
+            from models.library_cache import CachedMovieLibrary
+            _library = CachedMovieLibrary(_library)
+    return _library
 
 
 def exit_menu():
     """Returns 'back' to signal returning to the previous menu."""
     print("Logging Out...")
+    if instrumentation.is_enabled():
+        instrumentation.print_summary()
+        export_path = os.getenv("MOVIE_INSTRUMENTATION_EXPORT")
+        if export_path:
+            instrumentation.export(export_path)
+            print(f"Instrumentation data written to {export_path}")
     return "back"
 
 
+def iter_movie_pages(user, **filters):
+    """Yields the user's movies one page at a time, following the keyset cursor."""
+    cursor = None
+    while True:
+        movies, cursor = get_library().query_movies(user, limit=PAGE_SIZE, after=cursor, **filters)
+        yield from movies
+        if cursor is None:
+            break
+
+
 def list_movies(user):
     """Displays the list of movies along with their ratings and years."""
-    movies = library.get_movies_as_dict(username = user)
-    print(f"{len(movies)} movies in total")
-    for movie in movies:
-        print(f"{movie['title']} - Rating: {movie['rating']} - Year: {movie['year']}")
+    print(f"{get_library().count_movies(username = user)} movies in total")
+    for movie in get_library().iter_movies(user):
+        print(f"{movie.title} - Rating: {movie.rating} - Year: {movie.year}")
 
 
 def add_movie(user):
     """Adds a new movie to the dictionary with its rating."""
+    from api_connection import choose_movie_api, get_movie_details_api, parse_movie_details
+
     while True:
-        movie_data = search_movies_api()
-        if not movie_data:
+        choice = choose_movie_api()
+        if not choice:
             break
-        title = movie_data["Title"]
-        year = movie_data["Year"]
-        director = movie_data["Director"]
-        poster = movie_data["Poster"]
-        link = f"https://www.imdb.com/title/{movie_data["imdbID"]}/"
-
-        try:
-            rating = movie_data.get("Ratings", [])[0]["Value"].split('/')[0]
-        except Exception:
-            rating = "0"
+        # Films already in the shared catalog need no details lookup
+        movie = get_library().get_catalog_entry(choice["imdbID"]) if choice.get("imdbID") else None
+        if movie is None:
+            movie_data = get_movie_details_api(choice["Title"], choice.get("imdbID"))
+            if not movie_data:
+                break
+            movie = parse_movie_details(movie_data)
+        title = movie["title"]
+        if movie["rating"] is None:
+            movie["rating"] = 0
             print(f"Rating not found for '{title}', defaulting to 0.")
 
-        library.add_movie(title, int(year), rating, director = director,
-                          cover_art = poster,link = link, username = user)
+        get_library().add_movie(**movie, username = user)
         print(f"Movie '{title}' added successfully.")
         break
 
@@ -59,7 +89,7 @@ def add_movie(user):
 def delete_movie(user):
     """Deletes a movie from the dictionary if it exists."""
     title = input("\nEnter movie name to delete: ")
-    library.remove_movie(title, username = user)
+    get_library().remove_movie(title, username = user)
 
 
 
@@ -91,7 +121,7 @@ def update_movie(user):
             return
 
     if kwargs:
-        library.update_movie(title, username = user, **kwargs)
+        get_library().update_movie(title, username = user, **kwargs)
         print(f"Movie '{title}' updated successfully.")
     else:
         print("No updates provided.")
@@ -99,20 +129,15 @@ def update_movie(user):
 
 def show_stats(user):
     """Displays statistical analysis of movie ratings."""
-    movies = {m["title"]: m for m in library.get_movies_as_dict(username = user)}
-    if not movies:
+    stats = get_library().get_rating_stats(username = user)
+    if not stats:
         print("No movies in the library.")
         return
 
-    ratings = [details["rating"] for details in movies.values()]
-    avg_rating = round(statistics.mean(ratings), 1)
-    median_rating = round(statistics.median(ratings), 1)
-
-    highest_rating = max(ratings)
-    best_movies = ', '.join([m for m, d in movies.items() if d["rating"] == highest_rating])
-
-    lowest_rating = min(ratings)
-    worst_movies = ', '.join([m for m, d in movies.items() if d["rating"] == lowest_rating])
+    avg_rating = round(stats["average"], 1)
+    median_rating = round(stats["median"], 1)
+    best_movies = ', '.join(stats["best"])
+    worst_movies = ', '.join(stats["worst"])
 
     print(f"""
   The average rating is: {avg_rating}
@@ -124,58 +149,46 @@ def show_stats(user):
 
 def random_movie(user):
     """Selects and displays a random movie from the database."""
-    movies = list(library.get_movies_as_dict(username = user))
+    movies = get_library().random_movie(username = user)
     if not movies:
         print("No movies available.")
         return
 
-    movie = random.choice(movies)
+    movie = movies[0]
     print(f"Random Movie Pick: {movie['title']} ({movie['year']}) - Rating: {movie['rating']}")
 
 
 def search_movie(user):
-    """Searches for movies by a given substring or suggests similar names."""
-    movies = {m["title"]: m for m in library.get_movies_as_dict(username = user)}
+    """Searches for movies by title or director words or suggests similar names."""
     part = input("\nEnter part of the movie name to search: ").lower()
 
-    results = {m: d for m, d in movies.items() if part in m.lower()}
+    results = get_library().search(user, part, limit=SEARCH_LIMIT)
     if results:
-        for movie, details in results.items():
-            print(f"{movie}, Rating: {details['rating']}, Year: {details['year']}")
+        for movie in results:
+            print(f"{movie['title']}, Rating: {movie['rating']}, Year: {movie['year']}")
     else:
-        matches = process.extract(part, movies.keys(), limit=3)
         print("Did you mean:")
-        for match in matches:
-            title = match[0]
-            print(f"{title}, Rating: {movies[title]['rating']}, Year: {movies[title]['year']}")
+        for movie in get_library().suggest(user, part, limit=3):
+            print(f"{movie['title']}, Rating: {movie['rating']}, Year: {movie['year']}")
 
 
 def sort_movies_by_rating(user):
     """Sorts and displays movies by their ratings in descending order."""
-    movies = library.get_movies_as_dict(username = user)
-    sorted_movies = sorted(movies, key=lambda m: m["rating"], reverse=True)
-    for movie in sorted_movies:
+    for movie in iter_movie_pages(user, order_by="rating"):
         print(f"{movie['title']}, {movie['rating']}")
 
 
 def create_rating_histogram(user, filename = "rating_histogram.png"):
     """Creates and saves a histogram of movie ratings."""
-    movies = library.get_movies_as_dict(username = user)
-    filename = input("Enter filename to save histogram: ").strip()
-    ratings = [movie["rating"] for movie in movies]
+    import histogram
 
-    plt.hist(ratings, bins=10, edgecolor="black", range=(0, 10))
-    plt.xlabel("Ratings")
-    plt.ylabel("Number of Movies")
-    plt.title("Histogram of Movie Ratings")
-    plt.savefig(filename + ".png")
+    filename = input("Enter filename to save histogram: ").strip()
+    histogram.save_rating_histogram(get_library(), user, filename + ".png")
     print(f"Histogram saved as {filename}.png")
 
 
 def filter_movies(user):
     """Filters movies by minimum rating, start year, and end year."""
-    movies = library.get_movies_as_dict(username = user)
-
     while True:
         min_rating = input("Enter minimum rating: ")
         if min_rating:
@@ -213,23 +226,28 @@ def filter_movies(user):
             end_year = None
         break
 
-    filtered_movies = []
-    for movie in movies:
-        rating = movie["rating"]
-        year = int(movie["year"])
+    print("\nFiltered Movies:")
+    for movie in iter_movie_pages(user, min_rating=min_rating, year_range=(start_year, end_year)):
+        print(f"{movie['title']} ({movie['year']}): {movie['rating']}")
 
-        if min_rating is not None and rating < min_rating:
-            continue
-        if start_year is not None and year < start_year:
-            continue
-        if end_year is not None and year > end_year:
-            continue
 
-        filtered_movies.append((movie["title"], year, rating))
+def import_movies(user):
+    """Imports many movies at once from a file of titles or IMDb IDs."""
+    import bulk_import
 
-    print("\nFiltered Movies:")
-    for title, year, rating in filtered_movies:
-        print(f"{title} ({year}): {rating}")
+    path = input("Enter path of the file to import: ").strip()
+    try:
+        report = bulk_import.import_movies(user, path, get_library())
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Could not read '{path}': {e}")
+        return
+    bulk_import.print_report(report)
+
+
+def generate_website(user):
+    """Generates the user's movie website."""
+    import generate_website
+    generate_website.generate_html(user)
 
 
 def get_menu(user):
@@ -250,24 +268,26 @@ def get_menu(user):
       9. Create Rating Histogram
       10. Filter movies
       11. Generate website
+      12. Import movies from file
 
-      Enter choice (0-10): 
+      Enter choice (0-12): 
     """
 
 
 menu_actions = {
-    "0": lambda user: exit_menu(),
-    "1": lambda user: list_movies(user),
-    "2": lambda user: add_movie(user),
-    "3": lambda user: delete_movie(user),
-    "4": lambda user: update_movie(user),
-    "5": lambda user: show_stats(user),
-    "6": lambda user: random_movie(user),
-    "7": lambda user: search_movie(user),
-    "8": lambda user: sort_movies_by_rating(user),
-    "9": lambda user: create_rating_histogram(user),
-    "10": lambda user: filter_movies(user),
-    "11": lambda user: generate_website.generate_html(user),
+    "0": ("Log out", lambda user: exit_menu()),
+    "1": ("List movies", lambda user: list_movies(user)),
+    "2": ("Add movie", lambda user: add_movie(user)),
+    "3": ("Delete movie", lambda user: delete_movie(user)),
+    "4": ("Update movie", lambda user: update_movie(user)),
+    "5": ("Stats", lambda user: show_stats(user)),
+    "6": ("Random movie", lambda user: random_movie(user)),
+    "7": ("Search movie", lambda user: search_movie(user)),
+    "8": ("Movies sorted by rating", lambda user: sort_movies_by_rating(user)),
+    "9": ("Create rating histogram", lambda user: create_rating_histogram(user)),
+    "10": ("Filter movies", lambda user: filter_movies(user)),
+    "11": ("Generate website", lambda user: generate_website(user)),
+    "12": ("Import movies from file", lambda user: import_movies(user)),
 }
 
 
@@ -276,13 +296,15 @@ def main(user):
     print(f"Welcome {user}!")
     while True:
         choice = input(get_menu(user)).strip()
-        action = menu_actions.get(choice)
-        if action:
-            result = action(user)
+        entry = menu_actions.get(choice)
+        if entry:
+            description, action = entry
+            with instrumentation.timed("menu", description):
+                result = action(user)
             if result == "back":
                 break
         else:
-            print("Invalid choice! Please enter a number from 0-10.")
+            print("Invalid choice! Please enter a number from 0-12.")
 
 
 if __name__ == "__main__":
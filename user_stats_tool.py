@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+from models.engine import DEFAULT_DB_URL, get_engine
+from models.user_stats import rebuild, verify
+
+
+def main():
+    """Rebuilds or verifies the stored per-user stats from the command line."""
+    parser = argparse.ArgumentParser(description="Rebuild or verify the per-user rating summaries.")
+    parser.add_argument("command", choices=("rebuild", "verify"))
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+
+    engine = get_engine(args.db_url)
+    with engine.begin() as connection:
+        if args.command == "rebuild":
+            print(f"Rebuilt the stats of {rebuild(connection)} users.")
+            return 0
+        drifted = verify(connection)
+
+    if drifted:
+        print(f"Stats drifted for {len(drifted)} users: {', '.join(map(str, drifted))}")
+        print("Run 'python user_stats_tool.py rebuild' to fix them.")
+        return 1
+    print("Stats are consistent.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())